@@ -0,0 +1,275 @@
+import db
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# kind -> (metric, direction); "above" fires when the metric rises through the threshold
+ALERT_KINDS = {
+    "price_above": ("price", "above"),
+    "price_below": ("price", "below"),
+    "pct_change_above": ("pct_change", "above"),
+    "pct_change_below": ("pct_change", "below"),
+    "volume_above": ("volume", "above"),
+}
+
+ALERT_WEBHOOK_URL = os.getenv("ALERT_WEBHOOK_URL")
+ALERT_QUEUE_SIZE = int(os.getenv("ALERT_QUEUE_SIZE", "10000"))
+# After a failed rule load, quotes are evaluated against the rules already loaded until this passes
+ALERT_RELOAD_RETRY_SECONDS = float(os.getenv("ALERT_RELOAD_RETRY_SECONDS", "30"))
+
+
+class WebhookNotifier:
+    """POSTs triggered alerts as JSON to a webhook from a background thread"""
+
+    def __init__(self, url: str, timeout: float = 5.0, maxsize: int = ALERT_QUEUE_SIZE):
+        self.url = url
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=maxsize)
+        threading.Thread(target=self._deliver, name="alert-webhook", daemon=True).start()
+
+    def notify(self, event: dict):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            logger.warning(f"⚠️ Alert webhook queue full, dropped alert {event['alert_id']}")
+
+    def _deliver(self):
+        import requests
+
+        while True:
+            event = self._queue.get()
+            try:
+                requests.post(self.url, json=event, timeout=self.timeout).raise_for_status()
+            except Exception as e:
+                logger.error(f"❌ Alert webhook delivery failed for {event['alert_id']}: {e}")
+
+
+class _ThresholdIndex:
+    """Thresholds for one (symbol, metric, direction), kept sorted for bisect lookups"""
+
+    def __init__(self):
+        self.thresholds = []
+        self.rule_ids = []
+
+    def add(self, threshold: float, rule_id: str):
+        pos = bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(pos, threshold)
+        self.rule_ids.insert(pos, rule_id)
+
+    def remove(self, threshold: float, rule_id: str):
+        lo = bisect_left(self.thresholds, threshold)
+        hi = bisect_right(self.thresholds, threshold)
+        for pos in range(lo, hi):
+            if self.rule_ids[pos] == rule_id:
+                del self.thresholds[pos]
+                del self.rule_ids[pos]
+                return
+
+    def pop_range(self, lo: int, hi: int) -> list:
+        """Remove and return the rule ids in positions [lo, hi)"""
+        if lo >= hi:
+            return []
+        fired = self.rule_ids[lo:hi]
+        del self.thresholds[lo:hi]
+        del self.rule_ids[lo:hi]
+        return fired
+
+
+def quote_metrics(quote: dict) -> dict:
+    """Alert metrics for a quote"""
+    metrics = {"price": quote["close"], "volume": quote.get("volume", 0)}
+    # Only measured against the previous close, so every quote source shares one basis
+    prev_close = quote.get("prev_close")
+    if prev_close:
+        metrics["pct_change"] = (quote["close"] - prev_close) * 100 / prev_close
+    return metrics
+
+
+def _satisfied(direction: str, value: float, threshold: float) -> bool:
+    """Whether a value meets a rule's condition, matching the bisect bounds in evaluate"""
+    return value >= threshold if direction == "above" else value <= threshold
+
+
+class AlertEngine:
+    """
+    Evaluates one-shot alert rules on every quote
+
+    Rules are indexed per (symbol, metric, direction) by threshold. A tick only
+    bisects to the thresholds between the previous and the new value, so its cost
+    is proportional to the number of rules actually crossed.
+
+    Triggering is recorded on the rule in the database, so triggered alerts are
+    visible from every process (see list_triggered); the optional notifier
+    additionally pushes each event, e.g. to ALERT_WEBHOOK_URL.
+    """
+
+    def __init__(self, notifier=None):
+        self.notifier = notifier or (WebhookNotifier(ALERT_WEBHOOK_URL) if ALERT_WEBHOOK_URL else None)
+        self._lock = threading.Lock()
+        self._rules = {}
+        self._indexes = {}
+        self._last_values = {}
+        self._loaded = False
+        self._next_load_attempt = 0.0
+
+    def _index_rule(self, rule: dict):
+        metric, direction = ALERT_KINDS[rule["kind"]]
+        index = self._indexes.setdefault((rule["symbol"], metric, direction), _ThresholdIndex())
+        index.add(rule["threshold"], rule["_id"])
+        self._rules[rule["_id"]] = rule
+
+    def reload(self):
+        """(Re)load all active rules from the database, bounded by MONGO_WARMUP_TIMEOUT_SECONDS"""
+        import pymongo
+
+        with pymongo.timeout(db.WARMUP_TIMEOUT_SECONDS):
+            rules = list(db.alerts_collection.find({"status": "active"}))
+        with self._lock:
+            self._rules = {}
+            self._indexes = {}
+            for rule in rules:
+                self._index_rule(rule)
+            self._loaded = True
+        logger.info(f"🔔 Loaded {len(rules)} active alert rules")
+
+    def _ensure_loaded(self):
+        """Load the rules on first use, retrying at most every ALERT_RELOAD_RETRY_SECONDS"""
+        if self._loaded or time.monotonic() < self._next_load_attempt:
+            return
+        # Claimed before trying, so concurrent quotes don't all wait on the same failure
+        self._next_load_attempt = time.monotonic() + ALERT_RELOAD_RETRY_SECONDS
+        try:
+            self.reload()
+        except Exception as e:
+            logger.error(f"❌ Could not load alert rules, retrying in {ALERT_RELOAD_RETRY_SECONDS:.0f}s: {e}")
+
+    def add_rule(self, symbol: str, kind: str, threshold: float) -> dict:
+        """
+        Register a new rule for a normalized symbol
+
+        If the last value seen for the symbol already satisfies the rule, it
+        fires right away, as it would on the first tick after a restart.
+        """
+        if kind not in ALERT_KINDS:
+            raise ValueError(f"Unknown alert kind '{kind}'. Available: {', '.join(ALERT_KINDS)}")
+
+        self._ensure_loaded()
+        rule = {
+            "_id": uuid.uuid4().hex,
+            "symbol": symbol,
+            "kind": kind,
+            "threshold": float(threshold),
+            "status": "active",
+            "created_at": datetime.now().isoformat(),
+        }
+        db.alerts_collection.insert_one(rule)
+
+        metric, direction = ALERT_KINDS[kind]
+        with self._lock:
+            current = self._last_values.get((symbol, metric))
+            if current is None or not _satisfied(direction, current, rule["threshold"]):
+                self._index_rule(rule)
+                return rule
+
+        for event in self._trigger(symbol, [(rule, current)]):
+            rule.update(status="triggered", triggered_at=event["triggered_at"], triggered_value=current)
+        return rule
+
+    def remove_rule(self, rule_id: str) -> bool:
+        """Delete a rule; returns False if it didn't exist"""
+        self._ensure_loaded()
+        with self._lock:
+            rule = self._rules.pop(rule_id, None)
+            if rule is not None:
+                metric, direction = ALERT_KINDS[rule["kind"]]
+                self._indexes[(rule["symbol"], metric, direction)].remove(rule["threshold"], rule_id)
+        return db.alerts_collection.delete_one({"_id": rule_id}).deleted_count > 0 or rule is not None
+
+    def list_rules(self, symbol: str = None, limit: int = 500) -> list:
+        """Stored rules (active and triggered), optionally for one symbol"""
+        query = {"symbol": symbol} if symbol else {}
+        return list(db.alerts_collection.find(query).sort("created_at", -1).limit(limit))
+
+    def list_triggered(self, since: str = None, limit: int = 100) -> list:
+        """Rules triggered after `since` (ISO timestamp), oldest first, from any process"""
+        query = {"status": "triggered"}
+        if since:
+            query["triggered_at"] = {"$gt": since}
+        return list(db.alerts_collection.find(query).sort("triggered_at", 1).limit(limit))
+
+    def evaluate(self, symbol: str, metrics: dict) -> list:
+        """
+        Fire the rules whose thresholds were crossed by the new metric values
+
+        The first value seen for a metric counts as a crossing from outside the
+        range, so rules that are already satisfied fire on the first tick (rules
+        added after that are checked against the last value in add_rule).
+
+        Returns:
+            The triggered alert events
+        """
+        self._ensure_loaded()
+        fired = []
+
+        with self._lock:
+            for metric, value in metrics.items():
+                previous = self._last_values.get((symbol, metric))
+                self._last_values[(symbol, metric)] = value
+
+                above = self._indexes.get((symbol, metric, "above"))
+                if above and (previous is None or value > previous):
+                    lo = 0 if previous is None else bisect_right(above.thresholds, previous)
+                    hi = bisect_right(above.thresholds, value)
+                    fired.extend((rule_id, value) for rule_id in above.pop_range(lo, hi))
+
+                below = self._indexes.get((symbol, metric, "below"))
+                if below and (previous is None or value < previous):
+                    lo = bisect_left(below.thresholds, value)
+                    hi = len(below.thresholds) if previous is None else bisect_left(below.thresholds, previous)
+                    fired.extend((rule_id, value) for rule_id in below.pop_range(lo, hi))
+
+            rules = [(self._rules.pop(rule_id), value) for rule_id, value in fired]
+
+        return self._trigger(symbol, rules)
+
+    def _trigger(self, symbol: str, rules: list) -> list:
+        """Mark (rule, value) pairs triggered and notify; returns the delivered events"""
+        events = []
+        triggered_at = datetime.now().isoformat()
+        for rule, value in rules:
+            # Atomic transition so a rule fired by another process is delivered only once
+            result = db.alerts_collection.update_one(
+                {"_id": rule["_id"], "status": "active"},
+                {"$set": {"status": "triggered", "triggered_at": triggered_at, "triggered_value": value}},
+            )
+            if result.modified_count == 0:
+                continue
+
+            event = {
+                "alert_id": rule["_id"],
+                "symbol": symbol,
+                "kind": rule["kind"],
+                "threshold": rule["threshold"],
+                "value": value,
+                "triggered_at": triggered_at,
+            }
+            logger.info(f"🔔 Alert {rule['kind']} {rule['threshold']} triggered for {symbol} at {value}")
+            if self.notifier is not None:
+                self.notifier.notify(event)
+            events.append(event)
+
+        return events
+
+    def on_quote(self, quote: dict, previous_quote: dict = None):
+        """quote_cache listener: evaluate the symbol's rules on every refreshed quote"""
+        self.evaluate(quote["symbol"], quote_metrics(quote))
+
+
+alert_engine = AlertEngine()
@@ -0,0 +1,65 @@
+"""
+Import-time budget check for the API
+
+Imports `main` in fresh interpreters, reports the median wall time and fails
+if it exceeds the budget or if any heavy dependency was imported eagerly.
+
+Usage:
+    python bench_import_time.py [--runs 5] [--budget-ms 800]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Default budget; override with --budget-ms or IMPORT_TIME_BUDGET_MS
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "800"))
+
+# Modules that must only be imported on first use
+DEFERRED_MODULES = ["pandas", "yfinance", "numpy", "pymongo", "requests"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({
+    "elapsed_ms": elapsed_ms,
+    "eager": [name for name in %r if name in sys.modules],
+}))
+""" % (DEFERRED_MODULES,)
+
+def measure_once() -> dict:
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=backend_dir,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import time of main.py against a budget")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_TIME_BUDGET_MS)
+    args = parser.parse_args()
+
+    samples = [measure_once() for _ in range(args.runs)]
+    median_ms = statistics.median(sample["elapsed_ms"] for sample in samples)
+    eager = sorted({name for sample in samples for name in sample["eager"]})
+
+    print(f"import main: median {median_ms:.1f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    if eager:
+        print(f"eagerly imported: {', '.join(eager)}")
+
+    if median_ms > args.budget_ms or eager:
+        print("❌ Import-time budget exceeded")
+        sys.exit(1)
+    print("✅ Within import-time budget")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from profiling import run_profiled
+import contextvars
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Provider calls run here so a caller can stop waiting at the latency budget
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="provider")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose breaker is open"""
+
+
+class LatencyBudgetExceeded(Exception):
+    """Raised when a provider call takes longer than its latency budget"""
+
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker with a latency budget
+
+    After `failure_threshold` consecutive failures (errors or calls slower than the
+    budget) the breaker opens and calls fail immediately. Once `reset_timeout`
+    seconds have passed, a single probe call is let through (half-open): success
+    closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30.0,
+                 latency_budget: float = 5.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.latency_budget = latency_budget
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def _before_call(self):
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+                self._probe_in_flight = False
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                logger.info(f"🔌 {self.name} breaker half-open, probing provider")
+                return
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+
+    def _record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"✅ {self.name} breaker closed, provider recovered")
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def _record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning(f"⚠️ {self.name} breaker opened after {self._failures} failures")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def call(self, fn, *args, latency_budget: float = None, **kwargs):
+        """
+        Call fn through the breaker
+
+        Raises:
+            CircuitOpenError: The breaker is open; fn was not called
+            LatencyBudgetExceeded: fn did not return within the latency budget
+        """
+        self._before_call()
+        budget = latency_budget or self.latency_budget
+        # Carry the caller's context so a profiled request also profiles the provider call
+        future = _executor.submit(contextvars.copy_context().run, run_profiled, fn, *args, **kwargs)
+        try:
+            result = future.result(timeout=budget)
+        except FutureTimeoutError:
+            self._record_failure()
+            raise LatencyBudgetExceeded(f"{self.name} did not respond within {budget}s")
+        except Exception:
+            self._record_failure()
+            raise
+        self._record_success()
+        return result
+
+    def status(self) -> dict:
+        with self._lock:
+            state = self._state
+            if state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                state = HALF_OPEN
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "latency_budget_seconds": self.latency_budget,
+            }
@@ -1,19 +1,81 @@
-from pymongo import MongoClient
 from dotenv import load_dotenv
 import os
-import certifi
+import threading
 load_dotenv()
 
 MONGO_URI = os.environ.get("MONGO_URI")
-# Use certifi CA bundle and explicit TLS to avoid macOS LibreSSL handshake issues
-client = MongoClient(
-    MONGO_URI,
-    tls=True,
-    tlsCAFile=certifi.where(),
-    serverSelectionTimeoutMS=30000,
-    connectTimeoutMS=20000,
-    socketTimeoutMS=20000,
-)
-db = client["stock_dashboard"]
-stocks_collection = db["stocks"]
-news_collection = db["news"]
\ No newline at end of file
+DATABASE_NAME = "stock_dashboard"
+# Upper bound for the startup/readiness ping so an unreachable server fails fast
+WARMUP_TIMEOUT_SECONDS = float(os.getenv("MONGO_WARMUP_TIMEOUT_SECONDS", "5"))
+
+# Module attributes resolved lazily to collections, e.g. `db.stocks_collection`
+COLLECTIONS = {
+    "stocks_collection": "stocks",
+    "news_collection": "news",
+    "stats_collection": "stats",
+    "portfolios_collection": "portfolios",
+    "alerts_collection": "alerts",
+    "symbols_collection": "symbols",
+    "access_stats_collection": "access_stats",
+}
+
+_client = None
+_client_lock = threading.Lock()
+
+def connect():
+    """
+    Create the MongoClient on first use
+
+    Importing pymongo and building the client is deferred until here so that
+    importing this module stays cheap and never touches the network.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from pymongo import MongoClient
+                import certifi
+
+                # Use certifi CA bundle and explicit TLS to avoid macOS LibreSSL handshake issues
+                _client = MongoClient(
+                    MONGO_URI,
+                    tls=True,
+                    tlsCAFile=certifi.where(),
+                    serverSelectionTimeoutMS=30000,
+                    connectTimeoutMS=20000,
+                    socketTimeoutMS=20000,
+                )
+    return _client
+
+def get_database():
+    """Get the application database, connecting if needed"""
+    return connect()[DATABASE_NAME]
+
+def warm_up(timeout: float = WARMUP_TIMEOUT_SECONDS) -> bool:
+    """
+    Ping the server so the connection pool is established before traffic arrives
+
+    Returns:
+        True if the database answered within the timeout
+    """
+    import pymongo
+
+    try:
+        with pymongo.timeout(timeout):
+            connect().admin.command("ping")
+        return True
+    except Exception:
+        return False
+
+def close():
+    """Close the client; the next access reconnects"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+def __getattr__(name):
+    if name in COLLECTIONS:
+        return get_database()[COLLECTIONS[name]]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,236 @@
+import db
+from datetime import datetime, timedelta
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Single document holding all running statistics
+STATS_DOC_ID = "global"
+# Per-day ingest counts older than this are dropped from the stats document
+STATS_DAILY_RETENTION_DAYS = int(os.getenv("STATS_DAILY_RETENTION_DAYS", "90"))
+# A rebuild is discarded and redone when writes land while it is counting
+STATS_REBUILD_ATTEMPTS = 3
+
+_daily_pruned_on = None
+
+def _symbol_key(symbol: str) -> str:
+    """MongoDB field names cannot contain dots, so 'RELIANCE.NS' is stored as 'RELIANCE_NS'"""
+    return symbol.replace(".", "_")
+
+def _daily_cutoff() -> str:
+    return (datetime.now() - timedelta(days=STATS_DAILY_RETENTION_DAYS)).strftime("%Y-%m-%d")
+
+def _prune_daily(today: str):
+    """Drop per-day counts past STATS_DAILY_RETENTION_DAYS, at most once a day per process"""
+    global _daily_pruned_on
+    if _daily_pruned_on == today:
+        return
+    _daily_pruned_on = today
+
+    cutoff = _daily_cutoff()
+    doc = db.stats_collection.find_one({"_id": STATS_DOC_ID}, {"daily": 1}) or {}
+    expired = [day for day in (doc.get("daily") or {}) if day < cutoff]
+    if expired:
+        db.stats_collection.update_one(
+            {"_id": STATS_DOC_ID}, {"$unset": {f"daily.{day}": "" for day in expired}}
+        )
+
+def record_write(symbol: str, ohlc_date: str = None, ohlc_inserted: int = 0, news_inserted: int = 0,
+                 deleted_ohlc: int = 0, deleted_news: int = 0, reset_ohlc: bool = False,
+                 reset_news: bool = False):
+    """
+    Apply one write to the stats document with a single atomic update
+
+    Args:
+        symbol: Normalized stock symbol that was written
+        ohlc_date: Date (YYYY-MM-DD) of the inserted OHLC bar, if any
+        ohlc_inserted: Number of OHLC records inserted
+        news_inserted: Number of news articles inserted
+        deleted_ohlc: Number of OHLC records deleted before the insert
+        deleted_news: Number of news records deleted before the insert
+        reset_ohlc: True when all previous OHLC records for the symbol were deleted
+            (its OHLC count and date range start over)
+        reset_news: True when all previous news for the symbol was deleted
+    """
+    key = _symbol_key(symbol)
+    today = datetime.now().strftime("%Y-%m-%d")
+
+    update = {
+        "$inc": {
+            "total_ohlc_records": ohlc_inserted - deleted_ohlc,
+            "total_news_records": news_inserted - deleted_news,
+            f"daily.{today}.ohlc": ohlc_inserted,
+            f"daily.{today}.news": news_inserted,
+            "version": 1,  # Lets rebuild_stats detect writes made while it was counting
+        },
+        "$set": {
+            "last_updated": datetime.now().isoformat(),
+            f"symbols.{key}.symbol": symbol,
+        },
+    }
+
+    if reset_ohlc:
+        update["$set"][f"symbols.{key}.ohlc_count"] = ohlc_inserted
+        if ohlc_date:
+            update["$set"][f"symbols.{key}.first_date"] = ohlc_date
+            update["$set"][f"symbols.{key}.last_date"] = ohlc_date
+        else:
+            update["$unset"] = {f"symbols.{key}.first_date": "", f"symbols.{key}.last_date": ""}
+    else:
+        update["$inc"][f"symbols.{key}.ohlc_count"] = ohlc_inserted
+        if ohlc_date:
+            update["$min"] = {f"symbols.{key}.first_date": ohlc_date}
+            update["$max"] = {f"symbols.{key}.last_date": ohlc_date}
+
+    if reset_news:
+        update["$set"][f"symbols.{key}.news_count"] = news_inserted
+    else:
+        update["$inc"][f"symbols.{key}.news_count"] = news_inserted
+
+    try:
+        db.stats_collection.update_one({"_id": STATS_DOC_ID}, update, upsert=True)
+        _prune_daily(today)
+    except Exception as e:
+        # Stats must never break the write path; verify mode can repair drift
+        logger.error(f"❌ Error updating database stats for {symbol}: {e}")
+
+def _format_stats(doc: dict, today: str) -> dict:
+    """Shape a stats document into the /api/database/stats response"""
+    symbols = [
+        entry for entry in (doc.get("symbols") or {}).values()
+        if entry.get("ohlc_count", 0) > 0
+    ]
+    symbols.sort(key=lambda entry: entry["symbol"])
+    today_counts = (doc.get("daily") or {}).get(today, {})
+
+    return {
+        "total_ohlc_records": doc.get("total_ohlc_records", 0),
+        "total_news_records": doc.get("total_news_records", 0),
+        "today_ohlc_records": today_counts.get("ohlc", 0),
+        "today_news_records": today_counts.get("news", 0),
+        "unique_stocks": len(symbols),
+        "available_symbols": [entry["symbol"] for entry in symbols[:10]],  # Show first 10
+        "symbols": {
+            entry["symbol"]: {
+                "ohlc_count": entry.get("ohlc_count", 0),
+                "news_count": entry.get("news_count", 0),
+                "first_date": entry.get("first_date"),
+                "last_date": entry.get("last_date"),
+            } for entry in symbols
+        },
+        "last_updated": doc.get("last_updated"),
+    }
+
+def get_stats() -> dict:
+    """Read the maintained stats with a single document lookup"""
+    today = datetime.now().strftime("%Y-%m-%d")
+    projection = {
+        "total_ohlc_records": 1,
+        "total_news_records": 1,
+        "symbols": 1,
+        f"daily.{today}": 1,
+        "last_updated": 1,
+    }
+    doc = db.stats_collection.find_one({"_id": STATS_DOC_ID}, projection) or {}
+    return _format_stats(doc, today)
+
+def _recount() -> dict:
+    """Stats document recomputed from the collections with aggregation pipelines"""
+    symbols = {}
+    for row in db.stocks_collection.aggregate([
+        {"$group": {
+            "_id": "$symbol",
+            "ohlc_count": {"$sum": 1},
+            "first_date": {"$min": "$date"},
+            "last_date": {"$max": "$date"},
+        }}
+    ]):
+        if not row["_id"]:
+            continue
+        symbols[_symbol_key(row["_id"])] = {
+            "symbol": row["_id"],
+            "ohlc_count": row["ohlc_count"],
+            "news_count": 0,
+            "first_date": row["first_date"],
+            "last_date": row["last_date"],
+        }
+
+    for row in db.news_collection.aggregate([
+        {"$group": {"_id": "$stock", "news_count": {"$sum": 1}}}
+    ]):
+        if not row["_id"]:
+            continue
+        entry = symbols.setdefault(_symbol_key(row["_id"]), {"symbol": row["_id"], "ohlc_count": 0})
+        entry["news_count"] = row["news_count"]
+
+    daily = {}
+    for row in db.stocks_collection.aggregate([{"$group": {"_id": "$date", "count": {"$sum": 1}}}]):
+        daily.setdefault(row["_id"], {"ohlc": 0, "news": 0})["ohlc"] = row["count"]
+    for row in db.news_collection.aggregate([{"$group": {"_id": "$published_date", "count": {"$sum": 1}}}]):
+        daily.setdefault(row["_id"], {"ohlc": 0, "news": 0})["news"] = row["count"]
+
+    cutoff = _daily_cutoff()
+    return {
+        "_id": STATS_DOC_ID,
+        "total_ohlc_records": sum(entry["ohlc_count"] for entry in symbols.values()),
+        "total_news_records": sum(entry["news_count"] for entry in symbols.values()),
+        "symbols": symbols,
+        "daily": {day: counts for day, counts in daily.items() if day and day >= cutoff},
+        "last_updated": datetime.now().isoformat(),
+    }
+
+def _symbol_counts(symbols: dict, field: str) -> dict:
+    return {key: entry.get(field, 0) for key, entry in symbols.items() if entry.get(field, 0)}
+
+def rebuild_stats() -> dict:
+    """
+    Recompute the stats document from the collections with aggregation pipelines
+
+    Per-day counts are rebuilt from the stored record dates, since past ingest
+    events cannot be recovered from the data itself. The new document only
+    replaces the old one if its version is unchanged, i.e. no record_write
+    landed while counting; otherwise the count is redone.
+
+    Returns:
+        The recomputed stats plus whether they matched the maintained ones
+    """
+    from pymongo.errors import DuplicateKeyError
+
+    today = datetime.now().strftime("%Y-%m-%d")
+    saved = False
+
+    for _ in range(STATS_REBUILD_ATTEMPTS):
+        previous = db.stats_collection.find_one({"_id": STATS_DOC_ID}) or {}
+        doc = _recount()
+        doc["version"] = previous.get("version", 0) + 1
+        try:
+            # Matches a missing version too (no document, or one from before versioning)
+            result = db.stats_collection.replace_one(
+                {"_id": STATS_DOC_ID, "version": previous.get("version")}, doc, upsert=True
+            )
+            saved = result.matched_count > 0 or result.upserted_id is not None
+        except DuplicateKeyError:
+            saved = False  # The document was created or bumped meanwhile
+        if saved:
+            break
+        logger.info("🔄 Database stats changed during rebuild, recounting")
+
+    if not saved:
+        logger.warning("⚠️ Database stats kept changing during rebuild, stats document left as is")
+
+    previous_symbols = previous.get("symbols") or {}
+    consistent = (
+        previous.get("total_ohlc_records", 0) == doc["total_ohlc_records"]
+        and previous.get("total_news_records", 0) == doc["total_news_records"]
+        and _symbol_counts(previous_symbols, "ohlc_count") == _symbol_counts(doc["symbols"], "ohlc_count")
+        and _symbol_counts(previous_symbols, "news_count") == _symbol_counts(doc["symbols"], "news_count")
+    )
+    if not consistent and saved:
+        logger.warning("⚠️ Database stats drifted from stored data, stats document rebuilt")
+
+    stats = _format_stats(doc, today)
+    stats["verified"] = True
+    stats["consistent"] = consistent
+    stats["rebuilt"] = saved
+    return stats
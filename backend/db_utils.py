@@ -1,4 +1,5 @@
-from db import stocks_collection, news_collection
+import db
+from db_stats import record_write
 from datetime import datetime
 import logging
 
@@ -20,37 +21,90 @@ def update_stock_in_database(symbol: str, ohlc_data: dict, news_data: list, clea
         symbol: Stock symbol (e.g., 'RELIANCE.NS')
         ohlc_data: OHLC data dictionary
         news_data: List of news articles
-        clean_old_data: If True, delete all existing data for this stock before inserting new data
+        clean_old_data: If True, replace the stock's existing records of each kind being
+            written: all OHLC records when ohlc_data is given, all news when news_data is given
     """
     try:
         # Normalize symbol to ensure consistency
         normalized_symbol = normalize_symbol(symbol)
         today = datetime.now().strftime("%Y-%m-%d")
         
-        if clean_old_data:
-            # Delete ALL existing data for this stock (not just today's)
-            deleted_stocks = stocks_collection.delete_many({"symbol": normalized_symbol})
-            deleted_news = news_collection.delete_many({"stock": normalized_symbol})
-            logger.info(f"🧹 Cleaned up {deleted_stocks.deleted_count} old OHLC records and {deleted_news.deleted_count} old news records for {normalized_symbol}")
+        deleted_ohlc_count = 0
+        deleted_news_count = 0
+        ohlc_count = 0
+        news_count = 0
+        
+        # Delete ALL existing data of the kinds being written (not just today's), so a
+        # quote-only refresh doesn't pile up OHLC rows while the news is served from cache
+        if clean_old_data and ohlc_data:
+            deleted_ohlc_count = db.stocks_collection.delete_many({"symbol": normalized_symbol}).deleted_count
+        if clean_old_data and news_data:
+            deleted_news_count = db.news_collection.delete_many({"stock": normalized_symbol}).deleted_count
+        if deleted_ohlc_count or deleted_news_count:
+            logger.info(f"🧹 Cleaned up {deleted_ohlc_count} old OHLC records and {deleted_news_count} old news records for {normalized_symbol}")
         
         # Insert fresh OHLC data
         if ohlc_data:
             # Ensure the symbol in data is normalized
             ohlc_data["symbol"] = normalized_symbol
-            stocks_collection.insert_one(ohlc_data)
+            ohlc_data["updated_at"] = datetime.utcnow()  # Lets closed-market requests reuse it
+            db.stocks_collection.insert_one(ohlc_data)
+            ohlc_count = 1
             logger.info(f"📊 Inserted OHLC data for {normalized_symbol}")
         
         # Insert fresh news data
         if news_data:
-            news_count = 0
+            articles = []
             for article in news_data:
                 article_copy = article.copy()
                 article_copy["stock"] = normalized_symbol  # Use normalized symbol
                 article_copy["published_date"] = today
-                news_collection.insert_one(article_copy)
-                news_count += 1
+                article_copy["ingested_at"] = datetime.utcnow()  # TTL index field for news retention
+                articles.append(article_copy)
+            db.news_collection.insert_many(articles)
+            news_count = len(articles)
             logger.info(f"📰 Inserted {news_count} news articles for {normalized_symbol}")
+        
+        # Keep the running database stats in step with this write
+        record_write(
+            normalized_symbol,
+            ohlc_date=ohlc_data.get("date") if ohlc_data else None,
+            ohlc_inserted=ohlc_count,
+            news_inserted=news_count,
+            deleted_ohlc=deleted_ohlc_count,
+            deleted_news=deleted_news_count,
+            reset_ohlc=clean_old_data and bool(ohlc_data),
+            reset_news=clean_old_data and bool(news_data),
+        )
             
     except Exception as e:
         logger.error(f"❌ Error updating {symbol} in database: {e}")
         raise e
+
+def get_latest_stored_ohlc(symbol: str):
+    """Most recent stored OHLC record for a symbol (None if nothing is stored)"""
+    return db.stocks_collection.find_one(
+        {"symbol": normalize_symbol(symbol)},
+        {"_id": 0},
+        sort=[("date", -1), ("_id", -1)],
+    )
+
+def get_latest_stored_quotes(symbols: list) -> dict:
+    """Most recent stored OHLC record per symbol in one query ({symbol: record}, missing ones left out)"""
+    rows = db.stocks_collection.aggregate([
+        {"$match": {"symbol": {"$in": [normalize_symbol(s) for s in symbols]}}},
+        {"$sort": {"date": -1, "_id": -1}},
+        {"$group": {"_id": "$symbol", "record": {"$first": "$$ROOT"}}},
+    ])
+    return {
+        row["_id"]: {key: value for key, value in row["record"].items() if key != "_id"}
+        for row in rows
+    }
+
+def get_stored_news(symbol: str, limit: int = 5) -> list:
+    """Most recently stored news articles for a symbol"""
+    return list(
+        db.news_collection.find({"stock": normalize_symbol(symbol)}, {"_id": 0})
+        .sort("_id", -1)
+        .limit(limit)
+    )
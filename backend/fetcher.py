@@ -1,47 +1,225 @@
-import requests, os
-from db import stocks_collection, news_collection
-import yfinance as yf
-import pandas as pd
-from typing import cast
+import os
+from circuit_breaker import CircuitBreaker
 from dotenv import load_dotenv
 load_dotenv()
 
 ALPHA_KEY = os.getenv("ALPHA_VANTAGE_KEY")
 SERPAPI_KEY = os.getenv("SERPAPI_KEY")
 
+# yfinance (which pulls in pandas) and requests are imported inside the fetch
+# functions: they dominate import time and are only needed once a request arrives.
+
+# One breaker per upstream provider; callers fall back to stored data when they trip
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "3"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+# Multi-ticker downloads and long histories get a larger budget than single quotes
+YFINANCE_BATCH_LATENCY_BUDGET = float(os.getenv("YFINANCE_BATCH_LATENCY_BUDGET_SECONDS", "20"))
+
+YFINANCE_BREAKER = CircuitBreaker(
+    "yfinance",
+    failure_threshold=BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=BREAKER_RESET_SECONDS,
+    latency_budget=float(os.getenv("YFINANCE_LATENCY_BUDGET_SECONDS", "8")),
+)
+SERPAPI_BREAKER = CircuitBreaker(
+    "serpapi",
+    failure_threshold=BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=BREAKER_RESET_SECONDS,
+    latency_budget=float(os.getenv("SERPAPI_LATENCY_BUDGET_SECONDS", "4")),
+)
+
+
+def _fetch_history(symbol: str, **kwargs):
+    import yfinance as yf
+    from yfinance.exceptions import YFPricesMissingError, YFTickerMissingError, YFTzMissingError
+    import pandas as pd
 
-def fetch_ohlc(symbol: str):
     try:
-        ticker = yf.Ticker(symbol)
-        hist = ticker.history(period="1d")
+        return yf.Ticker(symbol).history(raise_errors=True, **kwargs)
+    except (YFPricesMissingError, YFTickerMissingError, YFTzMissingError):
+        # No data for this symbol/range is an answer, not a provider failure
+        return pd.DataFrame()
+
+
+def fetch_history(symbol: str, **kwargs):
+    """
+    Historical OHLC DataFrame for one symbol (yfinance history kwargs: period, start, end)
+
+    Raises CircuitOpenError/LatencyBudgetExceeded when yfinance is unavailable.
+    """
+    return YFINANCE_BREAKER.call(_fetch_history, symbol, latency_budget=YFINANCE_BATCH_LATENCY_BUDGET, **kwargs)
+
+
+# Frontend periods -> yfinance periods
+PERIOD_MAPPING = {
+    '7d': '7d',
+    '1M': '1mo',
+    '3M': '3mo',
+    '6M': '6mo',
+    '1Y': '1y',
+    '2Y': '2y',
+    '5Y': '5y',
+    'max': 'max'
+}
+
+
+def history_records(hist) -> list:
+    """Convert a yfinance history DataFrame to JSON-ready daily records"""
+    records = []
+    for i in range(len(hist)):
+        row = hist.iloc[i]
+        volume = row["Volume"]
+        records.append({
+            "date": str(hist.index[i])[:10],  # Get first 10 chars (YYYY-MM-DD)
+            "open": float(row["Open"]),
+            "high": float(row["High"]),
+            "low": float(row["Low"]),
+            "close": float(row["Close"]),
+            "volume": int(volume) if volume == volume else 0  # NaN check
+        })
+    return records
+
+
+def _fetch_ohlc(symbol: str):
+    # A few sessions back so the previous close comes along with the latest bar
+    hist = _fetch_history(symbol, period="5d")
+
+    if hist.empty:
+        return None
+
+    latest = hist.iloc[-1]
+    date = hist.index[-1]  # Avoids Pylance issues
+
+    return {
+        "symbol": symbol,
+        "open": float(latest["Open"]),
+        "high": float(latest["High"]),
+        "low": float(latest["Low"]),
+        "close": float(latest["Close"]),
+        "volume": int(latest.get("Volume", 0)),
+        "date": date.strftime("%Y-%m-%d"),
+        "prev_close": float(hist["Close"].iloc[-2]) if len(hist) > 1 else None
+    }
+
+
+def fetch_ohlc(symbol: str):
+    """
+    Latest daily bar (with the previous session's close) for a symbol, or None
+    if yfinance has no data for it
+
+    Raises CircuitOpenError/LatencyBudgetExceeded (or the provider error) when
+    yfinance is unavailable, so callers can fall back to stored data.
+    """
+    return YFINANCE_BREAKER.call(_fetch_ohlc, symbol)
+
+
+def _download(symbols: list, period: str):
+    import yfinance as yf
 
+    data = yf.download(list(symbols), period=period, group_by="ticker", progress=False, threads=True)
+    if data is None or data.empty:
+        # yfinance swallows download errors; nothing at all for a batch means the provider failed
+        raise RuntimeError(f"yfinance returned no data for {len(symbols)} symbols")
+    return data
+
+
+def fetch_quotes(symbols: list) -> dict:
+    """
+    Fetch the latest quote for many symbols with a single multi-ticker download
+
+    Returns:
+        {symbol: {"symbol", "open", "high", "low", "close", "volume", "date", "prev_close"}}
+        Symbols without data are left out.
+    """
+    if not symbols:
+        return {}
+
+    # A few days back so the previous session's close is always included
+    data = YFINANCE_BREAKER.call(_download, symbols, "5d", latency_budget=YFINANCE_BATCH_LATENCY_BUDGET)
+
+    quotes = {}
+    for symbol in symbols:
+        try:
+            hist = data[symbol].dropna(subset=["Close"])
+        except KeyError:
+            continue
         if hist.empty:
-            return None
+            continue
 
         latest = hist.iloc[-1]
-        date = hist.index[-1]  # Avoids Pylance issues
-
-        return {
+        quotes[symbol] = {
             "symbol": symbol,
             "open": float(latest["Open"]),
             "high": float(latest["High"]),
             "low": float(latest["Low"]),
             "close": float(latest["Close"]),
-            "volume": int(latest.get("Volume", 0)),
-            "date": date.strftime("%Y-%m-%d")
+            "volume": int(latest["Volume"]) if latest["Volume"] == latest["Volume"] else 0,  # NaN check
+            "date": hist.index[-1].strftime("%Y-%m-%d"),
+            "prev_close": float(hist["Close"].iloc[-2]) if len(hist) > 1 else None,
         }
-    except Exception as e:
-        return None
 
+    return quotes
+
+
+def fetch_price_ranges(symbols: list, period: str = "1y") -> dict:
+    """
+    Fetch the (low, high) price range over a period for many symbols in one download
+
+    Returns:
+        {symbol: (low, high)}; symbols without data are left out
+    """
+    if not symbols:
+        return {}
+
+    data = YFINANCE_BREAKER.call(_download, symbols, period, latency_budget=YFINANCE_BATCH_LATENCY_BUDGET)
+
+    ranges = {}
+    for symbol in symbols:
+        try:
+            hist = data[symbol].dropna(subset=["Close"])
+        except KeyError:
+            continue
+        if not hist.empty:
+            ranges[symbol] = (float(hist["Low"].min()), float(hist["High"].max()))
+
+    return ranges
+
+
+def fetch_histories(symbols: list, period: str) -> dict:
+    """
+    Fetch history for many symbols with a single multi-ticker download
+
+    Returns:
+        {symbol: DataFrame}; symbols without data are left out
+    """
+    if not symbols:
+        return {}
+
+    data = YFINANCE_BREAKER.call(_download, symbols, period, latency_budget=YFINANCE_BATCH_LATENCY_BUDGET)
+
+    histories = {}
+    for symbol in symbols:
+        try:
+            hist = data[symbol].dropna(subset=["Close"])
+        except KeyError:
+            continue
+        if not hist.empty:
+            histories[symbol] = hist
+
+    return histories
+
+
+def _fetch_news(stock_name):
+    import requests
 
-def fetch_news(stock_name):
     url = "https://serpapi.com/search.json"
     params = {
         "q": stock_name,
         "tbm": "nws",  # News tab
         "api_key": SERPAPI_KEY
     }
-    response = requests.get(url, params=params)
+    response = requests.get(url, params=params, timeout=SERPAPI_BREAKER.latency_budget)
+    response.raise_for_status()
     results = response.json().get("news_results", [])[:5]
 
     news = []
@@ -54,3 +232,13 @@ def fetch_news(stock_name):
         })
 
     return news
+
+
+def fetch_news(stock_name):
+    """
+    Latest news articles for a company from SerpAPI
+
+    Raises CircuitOpenError/LatencyBudgetExceeded (or the request error) when
+    SerpAPI is unavailable.
+    """
+    return SERPAPI_BREAKER.call(_fetch_news, stock_name)
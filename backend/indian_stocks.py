@@ -66,6 +66,65 @@ IT_STOCKS = [
     "TECHM.NS", "MINDTREE.NS", "MPHASIS.NS"
 ]
 
+# Seed data for the symbol master: symbol -> (company name, sector)
+# Loaded into the `symbols` collection on first use; edit there to recategorize
+SYMBOL_MASTER = {
+    "RELIANCE.NS": ("Reliance Industries", "energy"),
+    "TCS.NS": ("Tata Consultancy Services", "it"),
+    "HDFCBANK.NS": ("HDFC Bank", "banking"),
+    "INFY.NS": ("Infosys", "it"),
+    "ICICIBANK.NS": ("ICICI Bank", "banking"),
+    "HINDUNILVR.NS": ("Hindustan Unilever", "fmcg"),
+    "ITC.NS": ("ITC Limited", "fmcg"),
+    "SBIN.NS": ("State Bank of India", "banking"),
+    "BHARTIARTL.NS": ("Bharti Airtel", "telecom"),
+    "KOTAKBANK.NS": ("Kotak Mahindra Bank", "banking"),
+    "LT.NS": ("Larsen & Toubro", "infrastructure"),
+    "HCLTECH.NS": ("HCL Technologies", "it"),
+    "ASIANPAINT.NS": ("Asian Paints", "consumer"),
+    "MARUTI.NS": ("Maruti Suzuki", "auto"),
+    "BAJFINANCE.NS": ("Bajaj Finance", "financial_services"),
+    "WIPRO.NS": ("Wipro", "it"),
+    "ULTRACEMCO.NS": ("UltraTech Cement", "cement"),
+    "NESTLEIND.NS": ("Nestle India", "fmcg"),
+    "AXISBANK.NS": ("Axis Bank", "banking"),
+    "TITAN.NS": ("Titan Company", "consumer"),
+    "SUNPHARMA.NS": ("Sun Pharmaceutical", "pharma"),
+    "POWERGRID.NS": ("Power Grid Corporation", "power"),
+    "NTPC.NS": ("NTPC Limited", "power"),
+    "TECHM.NS": ("Tech Mahindra", "it"),
+    "M&M.NS": ("Mahindra & Mahindra", "auto"),
+    "BAJAJFINSV.NS": ("Bajaj Finserv", "financial_services"),
+    "DRREDDY.NS": ("Dr. Reddy's Laboratories", "pharma"),
+    "JSWSTEEL.NS": ("JSW Steel", "metals"),
+    "TATAMOTORS.NS": ("Tata Motors", "auto"),
+    "INDUSINDBK.NS": ("IndusInd Bank", "banking"),
+    "CIPLA.NS": ("Cipla", "pharma"),
+    "GRASIM.NS": ("Grasim Industries", "cement"),
+    "BRITANNIA.NS": ("Britannia Industries", "fmcg"),
+    "COALINDIA.NS": ("Coal India", "energy"),
+    "HINDALCO.NS": ("Hindalco Industries", "metals"),
+    "EICHERMOT.NS": ("Eicher Motors", "auto"),
+    "BPCL.NS": ("Bharat Petroleum", "energy"),
+    "ONGC.NS": ("Oil & Natural Gas Corporation", "energy"),
+    "DIVISLAB.NS": ("Divi's Laboratories", "pharma"),
+    "TATASTEEL.NS": ("Tata Steel", "metals"),
+    "HEROMOTOCO.NS": ("Hero MotoCorp", "auto"),
+    "ADANIPORTS.NS": ("Adani Ports", "infrastructure"),
+    "BAJAJ-AUTO.NS": ("Bajaj Auto", "auto"),
+    "SHREECEM.NS": ("Shree Cement", "cement"),
+    "APOLLOHOSP.NS": ("Apollo Hospitals", "healthcare"),
+    "UPL.NS": ("UPL Limited", "chemicals"),
+    "TATACONSUM.NS": ("Tata Consumer Products", "fmcg"),
+    "SBILIFE.NS": ("SBI Life Insurance", "insurance"),
+    "HDFCLIFE.NS": ("HDFC Life Insurance", "insurance"),
+    "GODREJCP.NS": ("Godrej Consumer Products", "fmcg"),
+    "BANKBARODA.NS": ("Bank of Baroda", "banking"),
+    "PNB.NS": ("Punjab National Bank", "banking"),
+    "MINDTREE.NS": ("Mindtree", "it"),
+    "MPHASIS.NS": ("Mphasis", "it"),
+}
+
 # Function to get all stocks or by category
 def get_stocks(category="all"):
     if category == "all":
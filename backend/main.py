@@ -1,24 +1,69 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from fetcher import fetch_ohlc, fetch_news
-from models import StockResponse, OHLCData, NewsArticle
-from db import stocks_collection, news_collection
-from db_utils import update_stock_in_database
-from stock_utils import normalize_symbol, find_stock_matches, clean_duplicate_symbols_in_db
+from fastapi.responses import StreamingResponse, JSONResponse, FileResponse
+from contextlib import asynccontextmanager
+from fetcher import fetch_ohlc, fetch_news, fetch_history, history_records, PERIOD_MAPPING, YFINANCE_BREAKER, SERPAPI_BREAKER
+from circuit_breaker import CircuitOpenError, LatencyBudgetExceeded
+from models import StockResponse, OHLCData, NewsArticle, PortfolioRequest, AlertRequest
+from db_utils import update_stock_in_database, get_latest_stored_ohlc, get_stored_news
+from db_stats import get_stats, rebuild_stats
+from stock_utils import normalize_symbol, find_stock_matches
+from maintenance import start_maintenance, get_maintenance_status, start_index_setup
+from portfolio import value_holdings, value_compiled, save_portfolio, load_portfolio, delete_portfolio
+from quote_cache import put_quote, add_listener, get_or_fetch_quotes, get_quote, put_news, get_news, put_history, get_history, quote_max_age, news_max_age, history_max_age
+from alerts import alert_engine, ALERT_KINDS
+from market_overview import market_breadth, ensure_ranges
+from symbol_master import get_symbol_master, get_categories
+from warmup import record_access, start_warmup, stop_warmup, trigger_warmup, get_warmup_status
+from trading_calendar import is_market_open, next_session_open, last_settled_close, is_current
+from profiling import PROFILING_ENABLED, PROFILING_SAMPLE_RATE, ARTIFACT_FORMATS, ProfilingMiddleware, get_profiled_route_class, list_profiles, get_artifact_path, token_matches
 from datetime import datetime
 from indian_stocks import get_stocks
 from typing import List, Optional
+import asyncio
+import db
 import logging
-import pandas as pd
-import yfinance as yf
 import io
+import time
+
+# pandas and yfinance are only imported inside fetcher's functions so that
+# startup, --reload cycles and test collection don't pay for them
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Stock Market Analysis API", version="1.0.0")
+STARTED_AT = time.time()
+READINESS_TIMEOUT_SECONDS = 2.0
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the MongoDB client and warm up the connection pool before serving"""
+    db.connect()
+    # The ping blocks, so keep it off the event loop; it is bounded by MONGO_WARMUP_TIMEOUT_SECONDS
+    database_ready = await asyncio.to_thread(db.warm_up)
+    if database_ready:
+        logger.info("✅ MongoDB connection warmed up")
+        # Includes the news TTL index, so retention works before the first maintenance run
+        start_index_setup()
+    else:
+        logger.warning("⚠️ MongoDB not reachable at startup, /api/ready will report not ready")
+    # Prefetch the most requested symbols now and just after every session opens
+    start_warmup(database_ready)
+    yield
+    await asyncio.to_thread(stop_warmup)
+    db.close()
+
+app = FastAPI(title="Stock Market Analysis API", version="1.0.0", lifespan=lifespan)
+
+# Opt-in request profiling; when disabled neither the middleware nor the route wrapper is installed
+if PROFILING_ENABLED:
+    app.router.route_class = get_profiled_route_class()
+    app.add_middleware(ProfilingMiddleware)
+
+# Evaluate price alerts and update market breadth on every refreshed quote
+add_listener(alert_engine.on_quote)
+add_listener(market_breadth.on_quote)
 
 # Add CORS middleware
 app.add_middleware(
@@ -42,6 +87,78 @@ def read_root():
         ]
     }
 
+@app.get("/api/health")
+def health_check():
+    """Liveness probe: the process is up and serving requests"""
+    return {
+        "status": "ok",
+        "uptime_seconds": round(time.time() - STARTED_AT, 1)
+    }
+
+@app.get("/api/ready")
+def readiness_check():
+    """Readiness probe: the database answers, so requests can be served"""
+    ready = db.warm_up(timeout=READINESS_TIMEOUT_SECONDS)
+    
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "database": "connected" if ready else "unreachable"
+        }
+    )
+
+@app.get("/api/market/status")
+def get_market_status():
+    """Whether the NSE session is open, and when prices next change"""
+    settled_at = last_settled_close()
+    return {
+        "is_open": is_market_open(),
+        "next_open": next_session_open().isoformat(),
+        "last_settled_close": settled_at.isoformat() if settled_at else None
+    }
+
+@app.get("/api/providers/status")
+def get_provider_status():
+    """Circuit breaker state of each upstream data provider"""
+    return {
+        "providers": {
+            "yfinance": YFINANCE_BREAKER.status(),
+            "serpapi": SERPAPI_BREAKER.status()
+        }
+    }
+
+def require_profiling_token(x_debug_profile: Optional[str] = Header(None)):
+    """Profiles expose request paths, queries and code internals: serve them only to PROFILING_TOKEN holders"""
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not token_matches(x_debug_profile):
+        raise HTTPException(status_code=403, detail="Send X-Debug-Profile with the PROFILING_TOKEN value")
+
+@app.get("/api/debug/profiles", dependencies=[Depends(require_profiling_token)])
+def get_profiles():
+    """Index of stored request profiles (send X-Debug-Profile to profile a request)"""
+    return {
+        "enabled": PROFILING_ENABLED,
+        "sample_rate": PROFILING_SAMPLE_RATE,
+        "profiles": list_profiles()
+    }
+
+@app.get("/api/debug/profiles/{profile_id}", dependencies=[Depends(require_profiling_token)])
+def download_profile(profile_id: str, format: str = "txt"):
+    """
+    Download a profile artifact
+    
+    Args:
+        profile_id: ID from the index or the X-Profile-Id response header
+        format: prof (cProfile dump for pstats/snakeviz), txt (report) or json (summary)
+    """
+    path = get_artifact_path(profile_id, format)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' ({format}) not found")
+    
+    return FileResponse(path, media_type=ARTIFACT_FORMATS[format], filename=f"{profile_id}.{format}")
+
 @app.get("/api/stocks/list")
 def get_stock_list():
     """Get list of all available stocks"""
@@ -49,11 +166,36 @@ def get_stock_list():
 
 @app.get("/api/stocks/categories")
 def get_stock_categories():
-    """Get stocks by category"""
+    """Get stocks by category (sectors from the symbol master)"""
     return {
         "all": get_stocks("all"),
-        "banking": get_stocks("banking"),
-        "it": get_stocks("it")
+        **get_categories()
+    }
+
+@app.get("/api/market/overview")
+def get_market_overview(refresh: bool = False, top: int = 5):
+    """
+    Market breadth, sector performance and top movers
+    
+    Aggregates are maintained incrementally as quotes arrive; this only fetches
+    quotes that are missing or stale (in one batch) before reading them.
+    
+    Args:
+        refresh: Refetch every quote instead of using fresh cached ones
+        top: Number of top gainers and losers to return
+    """
+    symbols = list(get_symbol_master())
+    
+    try:
+        ensure_ranges(symbols)
+        get_or_fetch_quotes(symbols, refresh=refresh)
+    except Exception as e:
+        # Serve whatever has been aggregated so far
+        logger.error(f"❌ Error refreshing market overview quotes: {e}")
+    
+    return {
+        "market_overview": market_breadth.snapshot(top),
+        "timestamp": datetime.now().isoformat()
     }
 
 @app.get("/api/stock/{symbol}")
@@ -65,7 +207,9 @@ def get_stock(symbol: str):
     - Case-insensitive symbol matching
     - Fuzzy matching for typos
     - Automatic symbol normalization
-    - Always fetches real-time data and updates database
+    - Serves quotes/news fetched within the cache TTLs, otherwise fetches live and updates database
+    - Outside NSE sessions, a quote stored after the last close is served without refetching
+    - Serves the last stored quote/news (marked stale) when a provider is down
     """
     today = datetime.now().strftime("%Y-%m-%d")
     
@@ -96,12 +240,37 @@ def get_stock(symbol: str):
         logger.warning(f"❌ No matches found for '{symbol}'")
         raise HTTPException(status_code=404, detail=error_msg)
     
-    # ALWAYS fetch real-time data (no database lookup first)
-    logger.info(f"🚀 Fetching real-time data for {final_symbol}")
+    record_access(final_symbol, "quote")
     
+    # Fetch real-time data unless the cache is fresh; each provider falls back to the last stored records when it fails
     try:
-        # Fetch real-time OHLC
-        real_time_ohlc = fetch_ohlc(final_symbol)
+        quote_source = "cache"
+        real_time_ohlc = get_quote(final_symbol, max_age=quote_max_age())
+        if real_time_ohlc is None and last_settled_close() is not None:
+            # Nothing trades until the next session, so a quote stored after the last close is still current
+            try:
+                stored = get_latest_stored_ohlc(final_symbol)
+                if stored and stored.get("updated_at") and is_current(stored["updated_at"]):
+                    real_time_ohlc = stored
+                    quote_source = "stored"
+            except Exception as e:
+                logger.error(f"❌ Could not read stored quote for {final_symbol}: {e}")
+        if real_time_ohlc is None:
+            logger.info(f"🚀 Fetching real-time data for {final_symbol}")
+            quote_source = "live"
+        try:
+            if quote_source == "live":
+                real_time_ohlc = fetch_ohlc(final_symbol)
+        except Exception as e:
+            logger.warning(f"⚠️ Price provider unavailable for {final_symbol} ({e}), serving stored data")
+            real_time_ohlc = get_latest_stored_ohlc(final_symbol)
+            quote_source = "database"
+            if not real_time_ohlc:
+                raise HTTPException(
+                    status_code=503,
+                    detail=f"Price data for '{symbol}' is temporarily unavailable and nothing is stored yet."
+                )
+        
         if not real_time_ohlc:
             logger.error(f"❌ No OHLC data returned for {final_symbol}")
             raise HTTPException(
@@ -109,14 +278,36 @@ def get_stock(symbol: str):
                 detail=f"No price data available for '{symbol}'. The stock might be delisted or market is closed."
             )
         
-        # Fetch real-time news
+        # News failures never block the price
         company_name = final_symbol.replace('.NS', '')
-        real_time_news = fetch_news(company_name)
-        
-        # Update database with fresh real-time data (clean old data)
-        update_stock_in_database(final_symbol, real_time_ohlc, real_time_news, clean_old_data=True)
+        news_source = "cache"
+        real_time_news = get_news(final_symbol, max_age=news_max_age())
+        try:
+            if real_time_news is None:
+                news_source = "live"
+                real_time_news = fetch_news(company_name)
+                put_news(final_symbol, real_time_news)
+        except Exception as e:
+            logger.warning(f"⚠️ News provider unavailable for {final_symbol} ({e}), serving stored news")
+            news_source = "database"
+            try:
+                real_time_news = get_stored_news(final_symbol)
+            except Exception as db_error:
+                logger.error(f"❌ Could not read stored news for {final_symbol}: {db_error}")
+                real_time_news = []
         
-        logger.info(f"✅ Updated {final_symbol} with real-time data")
+        # Update database with the freshly fetched parts only, each replacing its older records
+        try:
+            if quote_source == "live" or news_source == "live":
+                update_stock_in_database(
+                    final_symbol,
+                    real_time_ohlc if quote_source == "live" else None,
+                    real_time_news if news_source == "live" else [],
+                    clean_old_data=True
+                )
+                logger.info(f"✅ Updated {final_symbol} with real-time data")
+        except Exception as e:
+            logger.error(f"❌ Could not store data for {final_symbol}: {e}")
         
         # Clean the OHLC data to remove MongoDB ObjectId and other unwanted fields
         clean_ohlc = {
@@ -126,8 +317,11 @@ def get_stock(symbol: str):
             "low": real_time_ohlc.get("low"),
             "close": real_time_ohlc.get("close"),
             "volume": real_time_ohlc.get("volume", 0),
-            "date": real_time_ohlc.get("date")
+            "date": real_time_ohlc.get("date"),
+            "prev_close": real_time_ohlc.get("prev_close")
         }
+        if quote_source in ("live", "stored"):
+            put_quote(clean_ohlc)
         
         # Return the original user input as symbol for frontend display
         return {
@@ -143,9 +337,14 @@ def get_stock(symbol: str):
                     "snippet": n.get("summary", n.get("snippet", "")),
                     "source": n.get("source", ""),
                     "link": n.get("link", n.get("url", "")),
-                    "date": today
+                    "date": n.get("published_date", today) if news_source == "database" else today
                 } for n in real_time_news
-            ]
+            ],
+            "stale": quote_source == "database" or news_source == "database",
+            "sources": {
+                "quote": quote_source,
+                "news": news_source
+            }
         }
         
     except HTTPException:
@@ -181,31 +380,145 @@ def get_multiple_stocks(symbols: str):
     
     return results
 
-@app.get("/api/database/stats")
-def get_database_stats():
-    """Get current database statistics"""
-    today = datetime.now().strftime("%Y-%m-%d")
+@app.post("/api/portfolio/value")
+def value_portfolio(request: PortfolioRequest, refresh: bool = False):
+    """
+    Value a list of holdings without saving it
     
-    total_stocks = stocks_collection.count_documents({})
-    total_news = news_collection.count_documents({})
-    today_stocks = stocks_collection.count_documents({"date": today})
-    today_news = news_collection.count_documents({"published_date": today})
+    Args:
+        request: Holdings as (symbol, quantity, cost_basis)
+        refresh: Ignore cached quotes and fetch all prices live
+    """
+    logger.info(f"💼 Valuing portfolio with {len(request.holdings)} holdings")
     
-    # Get unique symbols
-    unique_symbols = stocks_collection.distinct("symbol")
+    try:
+        return value_holdings([h.model_dump() for h in request.holdings], refresh=refresh)
+    except Exception as e:
+        logger.error(f"❌ Error valuing portfolio: {e}")
+        raise HTTPException(status_code=500, detail=f"Error valuing portfolio: {str(e)}")
+
+@app.post("/api/portfolio")
+def create_portfolio(request: PortfolioRequest):
+    """Save a portfolio server-side so it can be revalued from cached quotes"""
+    try:
+        portfolio_id, errors = save_portfolio(request.name, [h.model_dump() for h in request.holdings])
+    except Exception as e:
+        logger.error(f"❌ Error saving portfolio: {e}")
+        raise HTTPException(status_code=500, detail=f"Error saving portfolio: {str(e)}")
     
     return {
-        "database_stats": {
-            "total_ohlc_records": total_stocks,
-            "total_news_records": total_news,
-            "today_ohlc_records": today_stocks,
-            "today_news_records": today_news,
-            "unique_stocks": len(unique_symbols),
-            "available_symbols": unique_symbols[:10],  # Show first 10
-            "last_updated": today
-        }
+        "portfolio_id": portfolio_id,
+        "name": request.name,
+        "unresolved": errors
     }
 
+@app.get("/api/portfolio/{portfolio_id}")
+def get_portfolio(portfolio_id: str, refresh: bool = False):
+    """
+    Value a saved portfolio, using cached quotes where they are still fresh
+    (and the last known prices, marked stale, when the price provider is down)
+    
+    Args:
+        portfolio_id: ID returned when the portfolio was saved
+        refresh: Ignore cached quotes and fetch all prices live
+    """
+    loaded = load_portfolio(portfolio_id)
+    if loaded is None:
+        raise HTTPException(status_code=404, detail=f"Portfolio '{portfolio_id}' not found")
+    
+    name, compiled = loaded
+    
+    try:
+        quotes = get_or_fetch_quotes(compiled["symbols"], refresh=refresh)
+    except Exception as e:
+        logger.error(f"❌ Error fetching quotes for portfolio {portfolio_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Error fetching portfolio quotes: {str(e)}")
+    
+    valuation = value_compiled(compiled, quotes)
+    valuation["portfolio_id"] = portfolio_id
+    valuation["name"] = name
+    return valuation
+
+@app.delete("/api/portfolio/{portfolio_id}")
+def remove_portfolio(portfolio_id: str):
+    """Delete a saved portfolio"""
+    if not delete_portfolio(portfolio_id):
+        raise HTTPException(status_code=404, detail=f"Portfolio '{portfolio_id}' not found")
+    
+    return {"message": f"Portfolio '{portfolio_id}' deleted", "status": "success"}
+
+def _format_alert(rule: dict) -> dict:
+    """Alert rule as returned by the API"""
+    alert = {key: value for key, value in rule.items() if key != "_id"}
+    alert["id"] = rule["_id"]
+    return alert
+
+@app.post("/api/alerts")
+def create_alert(request: AlertRequest):
+    """
+    Register a price, percent-change or volume alert for a stock
+    
+    Kinds: price_above, price_below, pct_change_above, pct_change_below, volume_above
+    """
+    if request.kind not in ALERT_KINDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown alert kind '{request.kind}'. Available: {', '.join(ALERT_KINDS)}"
+        )
+    
+    match_result = find_stock_matches(request.symbol)
+    if not match_result["exact_match"]:
+        raise HTTPException(status_code=404, detail=f"Stock '{request.symbol}' not found")
+    
+    rule = alert_engine.add_rule(match_result["exact_match"], request.kind, request.threshold)
+    logger.info(f"🔔 Registered {request.kind} alert at {request.threshold} for {rule['symbol']}")
+    
+    return {"alert": _format_alert(rule)}
+
+@app.get("/api/alerts")
+def list_alerts(symbol: Optional[str] = None):
+    """List alert rules, optionally for one stock"""
+    normalized = normalize_symbol(symbol) if symbol else None
+    return {"alerts": [_format_alert(rule) for rule in alert_engine.list_rules(normalized)]}
+
+@app.get("/api/alerts/triggered")
+def get_triggered_alerts(since: Optional[str] = None, limit: int = 100):
+    """
+    Alerts triggered after `since`, oldest first
+    
+    Read from the database, so alerts fired by the scheduler or another worker are
+    included. Pass the last `triggered_at` seen as `since` to poll for new ones.
+    """
+    try:
+        rules = alert_engine.list_triggered(since, limit)
+    except Exception as e:
+        logger.error(f"❌ Error reading triggered alerts: {e}")
+        raise HTTPException(status_code=500, detail=f"Error reading triggered alerts: {str(e)}")
+    
+    return {"triggered": [_format_alert(rule) for rule in rules]}
+
+@app.delete("/api/alerts/{alert_id}")
+def delete_alert(alert_id: str):
+    """Delete an alert rule"""
+    if not alert_engine.remove_rule(alert_id):
+        raise HTTPException(status_code=404, detail=f"Alert '{alert_id}' not found")
+    
+    return {"message": f"Alert '{alert_id}' deleted", "status": "success"}
+
+@app.get("/api/database/stats")
+def get_database_stats(verify: bool = False):
+    """
+    Get current database statistics
+    
+    Args:
+        verify: Recompute the stats from the collections and repair the stats document
+    """
+    if verify:
+        logger.info("🔍 Verifying database stats with a full recount")
+        return {"database_stats": rebuild_stats()}
+    
+    return {"database_stats": get_stats()}
+
 @app.get("/api/stocks/search/{query}")
 def search_stocks(query: str):
     """
@@ -217,6 +530,8 @@ def search_stocks(query: str):
     logger.info(f"🔍 Stock search query: '{query}'")
     
     match_result = find_stock_matches(query, max_suggestions=10)
+    if match_result["exact_match"]:
+        record_access(match_result["exact_match"], "search")
     
     return {
         "query": query,
@@ -226,28 +541,41 @@ def search_stocks(query: str):
         "total_suggestions": len(match_result["suggestions"]) + len(match_result["company_matches"])
     }
 
+@app.get("/api/warmup/status")
+def get_cache_warmup_status():
+    """Progress of the last cache warm-up and the currently hottest symbols"""
+    return {"warmup": get_warmup_status()}
+
+@app.post("/api/warmup")
+def start_cache_warmup():
+    """Prefetch quotes, history and news for the most requested symbols now"""
+    started = trigger_warmup("manual")
+    return {
+        "message": "Cache warm-up started" if started else "Cache warm-up already running",
+        "status": "started" if started else "running",
+        "warmup": get_warmup_status()
+    }
+
 @app.post("/api/database/cleanup")
 def cleanup_database():
     """
-    Clean up duplicate symbols in database
+    Start the background maintenance job: merge duplicate symbols, remove
+    duplicate bars and apply news/OHLC retention
     """
-    logger.info("🧹 Starting database cleanup...")
+    logger.info("🧹 Database maintenance requested...")
     
-    try:
-        cleaned_count = clean_duplicate_symbols_in_db()
-        
-        return {
-            "message": "Database cleanup completed",
-            "duplicates_cleaned": cleaned_count,
-            "status": "success"
-        }
-        
-    except Exception as e:
-        logger.error(f"❌ Error during database cleanup: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Database cleanup failed: {str(e)}"
-        )
+    started = start_maintenance()
+    
+    return {
+        "message": "Database maintenance started" if started else "Database maintenance already running",
+        "status": "started" if started else "running",
+        "job": get_maintenance_status()
+    }
+
+@app.get("/api/database/maintenance")
+def get_database_maintenance():
+    """Get the status and result of the last maintenance run"""
+    return {"maintenance": get_maintenance_status()}
 
 @app.get("/api/stock/{symbol}/history")
 def get_stock_history(symbol: str, period: str = "1M", start_date: Optional[str] = None, end_date: Optional[str] = None):
@@ -268,28 +596,24 @@ def get_stock_history(symbol: str, period: str = "1M", start_date: Optional[str]
     logger.info(f"📈 Fetching historical data for {symbol} (period: {period})")
     
     try:
-        ticker = yf.Ticker(symbol)
-        
         # Use date range if provided, otherwise use period
         if start_date and end_date:
             logger.info(f"📅 Using custom date range: {start_date} to {end_date}")
-            hist = ticker.history(start=start_date, end=end_date)
+            hist = fetch_history(symbol, start=start_date, end=end_date)
             display_period = f"{start_date} to {end_date}"
         else:
+            if symbol in get_stocks("all"):
+                record_access(symbol, "history", period)
+            cached = get_history(symbol, period, max_age=history_max_age())
+            if cached is not None:
+                return {
+                    "symbol": original_symbol,
+                    "period": period,
+                    "history": cached
+                }
             # Map frontend periods to yfinance periods
-            period_mapping = {
-                '7d': '7d',
-                '1M': '1mo', 
-                '3M': '3mo',
-                '6M': '6mo',
-                '1Y': '1y',
-                '2Y': '2y',
-                '5Y': '5y',
-                'max': 'max'
-            }
-            
-            yf_period = period_mapping.get(period, period)
-            hist = ticker.history(period=yf_period)
+            yf_period = PERIOD_MAPPING.get(period, period)
+            hist = fetch_history(symbol, period=yf_period)
             display_period = period
         
         if hist.empty:
@@ -299,19 +623,9 @@ def get_stock_history(symbol: str, period: str = "1M", start_date: Optional[str]
             )
         
         # Convert to list of dictionaries for JSON response
-        history_data = []
-        for i in range(len(hist)):
-            row = hist.iloc[i]
-            date_str = str(hist.index[i])[:10]  # Get first 10 chars (YYYY-MM-DD)
-            
-            history_data.append({
-                "date": date_str,
-                "open": float(row["Open"]),
-                "high": float(row["High"]),
-                "low": float(row["Low"]),
-                "close": float(row["Close"]),
-                "volume": int(row["Volume"]) if not pd.isna(row["Volume"]) else 0
-            })
+        history_data = history_records(hist)
+        if not (start_date and end_date):
+            put_history(symbol, period, history_data)
         
         logger.info(f"✅ Retrieved {len(history_data)} historical records for {symbol}")
         
@@ -321,6 +635,14 @@ def get_stock_history(symbol: str, period: str = "1M", start_date: Optional[str]
             "history": history_data
         }
         
+    except HTTPException:
+        raise
+    except (CircuitOpenError, LatencyBudgetExceeded) as e:
+        logger.warning(f"⚠️ Price provider unavailable for {symbol}: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail=f"Historical data for '{original_symbol}' is temporarily unavailable. Please retry shortly."
+        )
     except Exception as e:
         logger.error(f"❌ Error fetching historical data for {symbol}: {e}")
         raise HTTPException(
@@ -348,28 +670,15 @@ def export_stock_data(symbol: str, period: str = "1M", format: str = "csv", star
     logger.info(f"📥 Exporting {format.upper()} data for {symbol} (period: {period})")
     
     try:
-        ticker = yf.Ticker(symbol)
-        
         # Use date range if provided, otherwise use period
         if start_date and end_date:
             logger.info(f"📅 Exporting custom date range: {start_date} to {end_date}")
-            hist = ticker.history(start=start_date, end=end_date)
+            hist = fetch_history(symbol, start=start_date, end=end_date)
             filename_period = f"{start_date}_to_{end_date}"
         else:
             # Map frontend periods to yfinance periods
-            period_mapping = {
-                '7d': '7d',
-                '1M': '1mo', 
-                '3M': '3mo',
-                '6M': '6mo',
-                '1Y': '1y',
-                '2Y': '2y',
-                '5Y': '5y',
-                'max': 'max'
-            }
-            
-            yf_period = period_mapping.get(period, period)
-            hist = ticker.history(period=yf_period)
+            yf_period = PERIOD_MAPPING.get(period, period)
+            hist = fetch_history(symbol, period=yf_period)
             filename_period = period
         
         if hist.empty:
@@ -416,6 +725,14 @@ def export_stock_data(symbol: str, period: str = "1M", format: str = "csv", star
                 detail="Only CSV format is currently supported"
             )
         
+    except HTTPException:
+        raise
+    except (CircuitOpenError, LatencyBudgetExceeded) as e:
+        logger.warning(f"⚠️ Price provider unavailable for {symbol}: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail=f"Historical data for '{original_symbol}' is temporarily unavailable. Please retry shortly."
+        )
     except Exception as e:
         logger.error(f"❌ Error exporting data for {symbol}: {e}")
         raise HTTPException(
@@ -0,0 +1,238 @@
+import db
+from db_stats import rebuild_stats
+from datetime import datetime, timedelta
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Retention settings (days); 0 disables OHLC expiry
+NEWS_RETENTION_DAYS = int(os.getenv("NEWS_RETENTION_DAYS", "30"))
+OHLC_RETENTION_DAYS = int(os.getenv("OHLC_RETENTION_DAYS", "0"))
+
+# Throttling so deletes never hold the database for long
+BATCH_SIZE = int(os.getenv("MAINTENANCE_BATCH_SIZE", "500"))
+BATCH_PAUSE_SECONDS = float(os.getenv("MAINTENANCE_BATCH_PAUSE_SECONDS", "0.2"))
+
+_job_lock = threading.Lock()
+_job_state = {
+    "status": "idle",
+    "started_at": None,
+    "finished_at": None,
+    "last_result": None,
+    "last_error": None,
+}
+
+def _normalized_symbol_expr(field: str) -> dict:
+    """Server-side equivalent of stock_utils.normalize_symbol (trim, uppercase, add .NS)"""
+    return {
+        "$let": {
+            "vars": {"s": {"$toUpper": {"$trim": {"input": f"${field}"}}}},
+            "in": {
+                "$cond": [
+                    {"$regexMatch": {"input": "$$s", "regex": r"\.NS$"}},
+                    "$$s",
+                    {"$concat": ["$$s", ".NS"]},
+                ]
+            },
+        }
+    }
+
+def _delete_in_batches(collection, ids: list) -> int:
+    """Delete documents by _id in small batches with a pause between them"""
+    deleted = 0
+    for start in range(0, len(ids), BATCH_SIZE):
+        batch = ids[start:start + BATCH_SIZE]
+        deleted += collection.delete_many({"_id": {"$in": batch}}).deleted_count
+        if start + BATCH_SIZE < len(ids):
+            time.sleep(BATCH_PAUSE_SECONDS)
+    return deleted
+
+def _delete_matching_in_batches(collection, query: dict) -> int:
+    """Delete all documents matching a query, one throttled batch at a time"""
+    deleted = 0
+    while True:
+        ids = [doc["_id"] for doc in collection.find(query, {"_id": 1}).limit(BATCH_SIZE)]
+        if not ids:
+            return deleted
+        deleted += collection.delete_many({"_id": {"$in": ids}}).deleted_count
+        time.sleep(BATCH_PAUSE_SECONDS)
+
+def ensure_indexes():
+    """Create the indexes maintenance and the read paths rely on, including the news TTL index"""
+    db.stocks_collection.create_index([("symbol", 1), ("date", -1)])
+    db.news_collection.create_index([("stock", 1), ("published_date", -1)])
+    db.alerts_collection.create_index([("status", 1), ("triggered_at", 1)])
+
+    if NEWS_RETENTION_DAYS <= 0:
+        return
+
+    from pymongo.errors import OperationFailure
+
+    expire_seconds = NEWS_RETENTION_DAYS * 24 * 3600
+    try:
+        db.news_collection.create_index("ingested_at", expireAfterSeconds=expire_seconds)
+    except OperationFailure:
+        # Index exists with a different retention; update it in place
+        db.news_collection.database.command(
+            "collMod",
+            db.news_collection.name,
+            index={"keyPattern": {"ingested_at": 1}, "expireAfterSeconds": expire_seconds},
+        )
+
+def start_index_setup():
+    """
+    Run ensure_indexes on a background thread, called at startup
+
+    The news TTL index must exist for expiry to work even if the maintenance job
+    never runs; building it on a large collection can take a while, so startup
+    doesn't wait for it.
+    """
+    def _run():
+        try:
+            ensure_indexes()
+            logger.info("✅ Database indexes ensured")
+        except Exception as e:
+            logger.error(f"❌ Could not create database indexes: {e}")
+
+    threading.Thread(target=_run, name="db-indexes", daemon=True).start()
+
+def merge_symbol_variants(collection, field: str) -> list:
+    """
+    Rewrite case/format variants of a symbol (e.g. 'reliance', 'Reliance.ns') to the
+    normalized form with a single $merge aggregation
+
+    Returns:
+        The variant symbols that were rewritten
+    """
+    match_variants = [
+        {"$match": {field: {"$type": "string"}}},
+        {"$set": {"_normalized": _normalized_symbol_expr(field)}},
+        {"$match": {"$expr": {"$ne": [f"${field}", "$_normalized"]}}},
+    ]
+
+    variants = [
+        row["_id"] for row in collection.aggregate(
+            match_variants + [{"$group": {"_id": f"${field}"}}], allowDiskUse=True
+        )
+    ]
+    if not variants:
+        return []
+
+    collection.aggregate(
+        match_variants + [
+            {"$set": {field: "$_normalized"}},
+            {"$unset": "_normalized"},
+            {"$merge": {
+                "into": collection.name,
+                "on": "_id",
+                "whenMatched": "replace",
+                "whenNotMatched": "discard",
+            }},
+        ],
+        allowDiskUse=True,
+    )
+
+    for variant in variants:
+        logger.info(f"🔄 Merged {variant} in {collection.name}")
+    return variants
+
+def remove_duplicate_bars() -> int:
+    """
+    Collapse every (symbol, date) collision into one bar, keeping the newest insert
+
+    Each stored row is a snapshot of that day's cumulative bar, so the newest
+    snapshot already carries the day's open, high, low, close and volume.
+    """
+    duplicate_ids = []
+    for row in db.stocks_collection.aggregate([
+        {"$sort": {"_id": 1}},
+        {"$group": {
+            "_id": {"symbol": "$symbol", "date": "$date"},
+            "ids": {"$push": "$_id"},
+        }},
+        {"$match": {"ids.1": {"$exists": True}}},
+    ], allowDiskUse=True):
+        duplicate_ids.extend(row["ids"][:-1])
+
+    return _delete_in_batches(db.stocks_collection, duplicate_ids)
+
+def apply_retention() -> dict:
+    """Delete news and OHLC records past their retention window"""
+    expired_news = 0
+    expired_ohlc = 0
+
+    if NEWS_RETENTION_DAYS > 0:
+        # Covers articles stored before the TTL field existed
+        news_cutoff = (datetime.now() - timedelta(days=NEWS_RETENTION_DAYS)).strftime("%Y-%m-%d")
+        expired_news = _delete_matching_in_batches(db.news_collection, {"published_date": {"$lt": news_cutoff}})
+
+    if OHLC_RETENTION_DAYS > 0:
+        ohlc_cutoff = (datetime.now() - timedelta(days=OHLC_RETENTION_DAYS)).strftime("%Y-%m-%d")
+        expired_ohlc = _delete_matching_in_batches(db.stocks_collection, {"date": {"$lt": ohlc_cutoff}})
+
+    return {"expired_news": expired_news, "expired_ohlc": expired_ohlc}
+
+def run_maintenance() -> dict:
+    """
+    Run the full compaction, dedup and retention pass
+
+    Returns:
+        Summary of what was merged, removed and expired
+    """
+    logger.info("🧹 Starting database maintenance...")
+    started = time.time()
+
+    ensure_indexes()
+
+    merged_stocks = merge_symbol_variants(db.stocks_collection, "symbol")
+    merged_news = merge_symbol_variants(db.news_collection, "stock")
+    duplicate_bars = remove_duplicate_bars()
+    retention = apply_retention()
+
+    # Merges, deletes and TTL expiry bypass the incremental stats, so recount once
+    rebuild_stats()
+
+    result = {
+        "duplicates_cleaned": len(set(merged_stocks) | set(merged_news)),
+        "duplicate_bars_removed": duplicate_bars,
+        **retention,
+        "duration_seconds": round(time.time() - started, 2),
+    }
+    logger.info(f"✅ Database maintenance completed: {result}")
+    return result
+
+def _run_job():
+    try:
+        result = run_maintenance()
+        with _job_lock:
+            _job_state.update(status="idle", last_result=result, last_error=None)
+    except Exception as e:
+        logger.error(f"❌ Error during database maintenance: {e}")
+        with _job_lock:
+            _job_state.update(status="failed", last_error=str(e))
+    finally:
+        with _job_lock:
+            _job_state["finished_at"] = datetime.now().isoformat()
+
+def start_maintenance() -> bool:
+    """
+    Start the maintenance job in a background thread
+
+    Returns:
+        False if a run is already in progress
+    """
+    with _job_lock:
+        if _job_state["status"] == "running":
+            return False
+        _job_state.update(status="running", started_at=datetime.now().isoformat(), finished_at=None)
+
+    threading.Thread(target=_run_job, name="db-maintenance", daemon=True).start()
+    return True
+
+def get_maintenance_status() -> dict:
+    """Get the state of the current or last maintenance run"""
+    with _job_lock:
+        return dict(_job_state)
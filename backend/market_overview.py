@@ -0,0 +1,136 @@
+from quote_cache import percent_change
+from symbol_master import get_sector
+from bisect import bisect_left, insort
+from datetime import datetime
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class MarketBreadth:
+    """
+    Running market breadth and sector aggregates
+
+    Every quote replaces its symbol's previous contribution to the counters and
+    sector sums, so an update is O(1) (plus a bisect to keep the gainers/losers
+    ranking sorted) and reading the overview never rescans the universe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {}  # symbol -> (change_pct, close, sector, at_high, at_low)
+        self._ranges = {}  # symbol -> [low, high] over the last 52 weeks
+        self._ranges_date = None
+        self._ranked = []  # sorted (change_pct, symbol)
+        self._sector_sum = {}
+        self._sector_count = {}
+        self.advances = 0
+        self.declines = 0
+        self.unchanged = 0
+        self.new_highs = 0
+        self.new_lows = 0
+
+    def _apply(self, state: tuple, sign: int):
+        change, _, sector, at_high, at_low = state
+        if change > 0:
+            self.advances += sign
+        elif change < 0:
+            self.declines += sign
+        else:
+            self.unchanged += sign
+        self.new_highs += sign * at_high
+        self.new_lows += sign * at_low
+        self._sector_sum[sector] = self._sector_sum.get(sector, 0.0) + sign * change
+        self._sector_count[sector] = self._sector_count.get(sector, 0) + sign
+
+    def on_quote(self, quote: dict, previous_quote: dict = None):
+        """quote_cache listener: fold the new quote into the running totals"""
+        change = percent_change(quote)
+        if change is None:
+            return
+        symbol = quote["symbol"]
+        sector = get_sector(symbol)
+
+        with self._lock:
+            old = self._state.get(symbol)
+            if old is not None:
+                self._apply(old, -1)
+                del self._ranked[bisect_left(self._ranked, (old[0], symbol))]
+
+            at_high = at_low = False
+            price_range = self._ranges.get(symbol)
+            if price_range is not None:
+                if quote["high"] >= price_range[1]:
+                    price_range[1] = quote["high"]
+                    at_high = True
+                if quote["low"] <= price_range[0]:
+                    price_range[0] = quote["low"]
+                    at_low = True
+
+            state = (change, quote["close"], sector, at_high, at_low)
+            self._state[symbol] = state
+            self._apply(state, 1)
+            insort(self._ranked, (change, symbol))
+
+    def needs_ranges(self, today: str) -> bool:
+        return self._ranges_date != today
+
+    def set_ranges(self, ranges: dict, as_of: str):
+        """Set the 52-week (low, high) per symbol used to detect new highs and lows"""
+        with self._lock:
+            self._ranges = {symbol: [low, high] for symbol, (low, high) in ranges.items()}
+            self._ranges_date = as_of
+
+    def snapshot(self, top_n: int = 5) -> dict:
+        """Current breadth, sector averages and top movers"""
+        with self._lock:
+            def mover(change, symbol):
+                return {
+                    "symbol": symbol,
+                    "change_pct": round(change, 2),
+                    "close": self._state[symbol][1],
+                }
+
+            gainers = [mover(*entry) for entry in reversed(self._ranked[-top_n:]) if entry[0] > 0]
+            losers = [mover(*entry) for entry in self._ranked[:top_n] if entry[0] < 0]
+
+            return {
+                "advances": self.advances,
+                "declines": self.declines,
+                "unchanged": self.unchanged,
+                "advance_decline_ratio": round(self.advances / self.declines, 2) if self.declines else None,
+                "new_highs": self.new_highs,
+                "new_lows": self.new_lows,
+                "sectors": {
+                    sector: {
+                        "avg_change_pct": round(self._sector_sum[sector] / count, 2),
+                        "stocks": count,
+                    } for sector, count in sorted(self._sector_count.items()) if count > 0
+                },
+                "top_gainers": gainers,
+                "top_losers": losers,
+                "symbols_tracked": len(self._state),
+            }
+
+
+market_breadth = MarketBreadth()
+_ranges_lock = threading.Lock()
+
+def ensure_ranges(symbols: list):
+    """Load today's 52-week ranges once per day with a single multi-ticker download"""
+    from fetcher import fetch_price_ranges
+
+    today = datetime.now().strftime("%Y-%m-%d")
+    if not market_breadth.needs_ranges(today):
+        return
+
+    with _ranges_lock:
+        if not market_breadth.needs_ranges(today):
+            return
+        try:
+            market_breadth.set_ranges(fetch_price_ranges(symbols), today)
+            logger.info(f"📊 Loaded 52-week ranges for {len(symbols)} symbols")
+        except Exception as e:
+            # Breadth still works without ranges, just without new highs/lows
+            logger.error(f"❌ Could not load 52-week ranges: {e}")
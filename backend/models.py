@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 
 class OHLCData(BaseModel):
@@ -26,3 +26,17 @@ class StockResponse(BaseModel):
     symbol: str
     data: StockData
     news: List[NewsArticle]
+
+class Holding(BaseModel):
+    symbol: str
+    quantity: float
+    cost_basis: float  # Average cost per share
+
+class PortfolioRequest(BaseModel):
+    name: Optional[str] = None
+    holdings: List[Holding]
+
+class AlertRequest(BaseModel):
+    symbol: str
+    kind: str  # price_above, price_below, pct_change_above, pct_change_below, volume_above
+    threshold: float
@@ -0,0 +1,227 @@
+import db
+from quote_cache import get_or_fetch_quotes
+from stock_utils import find_stock_matches
+from symbol_master import get_sector
+from datetime import datetime
+import logging
+import math
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Saved portfolios compiled to arrays, so revaluation skips re-resolution. Entries are
+# checked against the stored updated_at on every load, since other workers may have
+# changed or deleted the portfolio.
+_compiled_lock = threading.Lock()
+_compiled = {}  # portfolio id -> (updated_at, name, compiled holdings)
+
+def resolve_holdings(holdings: list) -> tuple:
+    """
+    Resolve holding symbols through find_stock_matches in one pass and merge repeats
+
+    Args:
+        holdings: List of {"symbol", "quantity", "cost_basis"} as entered by the user
+
+    Returns:
+        (resolved holdings with normalized symbols, {input symbol: error message})
+    """
+    resolved_symbols = {}
+    errors = {}
+    merged = {}  # symbol -> [quantity, total cost]
+
+    for holding in holdings:
+        raw_symbol = holding["symbol"]
+        if raw_symbol not in resolved_symbols:
+            match_result = find_stock_matches(raw_symbol)
+            resolved_symbols[raw_symbol] = match_result["exact_match"]
+            if not match_result["exact_match"]:
+                error_msg = f"Stock '{raw_symbol}' not found."
+                if match_result["suggestions"]:
+                    error_msg += f" Did you mean: {', '.join(match_result['suggestions'][:3])}?"
+                errors[raw_symbol] = error_msg
+
+        symbol = resolved_symbols[raw_symbol]
+        if symbol is None:
+            continue
+
+        position = merged.setdefault(symbol, [0.0, 0.0])
+        position[0] += holding["quantity"]
+        position[1] += holding["quantity"] * holding["cost_basis"]
+
+    resolved = [
+        {
+            "symbol": symbol,
+            "quantity": quantity,
+            "cost_basis": total_cost / quantity if quantity else 0.0,
+        } for symbol, (quantity, total_cost) in merged.items()
+    ]
+    return resolved, errors
+
+def compile_holdings(holdings: list) -> dict:
+    """Turn resolved holdings into numpy arrays plus sector codes for vectorized valuation"""
+    import numpy as np
+
+    symbols = [holding["symbol"] for holding in holdings]
+    sectors = [get_sector(symbol) for symbol in symbols]
+    sector_names = sorted(set(sectors))
+    sector_index = {name: i for i, name in enumerate(sector_names)}
+
+    return {
+        "symbols": symbols,
+        "quantity": np.array([holding["quantity"] for holding in holdings], dtype=float),
+        "cost_basis": np.array([holding["cost_basis"] for holding in holdings], dtype=float),
+        "sectors": sectors,
+        "sector_names": sector_names,
+        "sector_codes": np.array([sector_index[sector] for sector in sectors], dtype=int),
+    }
+
+def _number(value, digits: int = 2):
+    """JSON-safe rounded float (NaN becomes None)"""
+    value = float(value)
+    return None if math.isnan(value) else round(value, digits)
+
+def value_compiled(compiled: dict, quotes: dict) -> dict:
+    """
+    Compute market value, day change, unrealized P&L and sector weights
+
+    Day change is measured against the previous session close only, like market
+    breadth and alerts; holdings whose quote lacks it have no day change and are
+    left out of the day-change totals. Holdings without a quote are reported but
+    excluded from the totals; holdings priced from last known (stale) quotes are listed.
+    """
+    import numpy as np
+
+    symbols = compiled["symbols"]
+    quantity = compiled["quantity"]
+    cost_basis = compiled["cost_basis"]
+
+    price = np.array([quotes[s]["close"] if s in quotes else np.nan for s in symbols], dtype=float)
+    reference = np.array([
+        (quotes[s].get("prev_close") or np.nan) if s in quotes else np.nan
+        for s in symbols
+    ], dtype=float)
+
+    market_value = quantity * price
+    cost_value = quantity * cost_basis
+    unrealized_pnl = market_value - cost_value
+    unrealized_pnl_pct = np.divide(
+        unrealized_pnl * 100, cost_value,
+        out=np.full_like(unrealized_pnl, np.nan), where=cost_value != 0
+    )
+    day_change = quantity * (price - reference)
+
+    priced = ~np.isnan(price)
+    total_market_value = market_value[priced].sum()
+    total_cost_value = cost_value[priced].sum()
+    total_pnl = total_market_value - total_cost_value
+    changed = ~np.isnan(day_change)
+    total_day_change = day_change[changed].sum()
+    previous_value = market_value[changed].sum() - total_day_change
+
+    stale_quotes = [s for s in symbols if quotes.get(s, {}).get("stale")]
+    weights = market_value / total_market_value if total_market_value else np.zeros_like(market_value)
+    sector_values = np.bincount(
+        compiled["sector_codes"][priced],
+        weights=market_value[priced],
+        minlength=len(compiled["sector_names"]),
+    )
+
+    return {
+        "holdings": [
+            {
+                "symbol": symbols[i],
+                "sector": compiled["sectors"][i],
+                "quantity": _number(quantity[i], 4),
+                "cost_basis": _number(cost_basis[i]),
+                "price": _number(price[i]),
+                "market_value": _number(market_value[i]),
+                "cost_value": _number(cost_value[i]),
+                "unrealized_pnl": _number(unrealized_pnl[i]),
+                "unrealized_pnl_pct": _number(unrealized_pnl_pct[i]),
+                "day_change": _number(day_change[i]),
+                "weight_pct": _number(weights[i] * 100),
+            } for i in range(len(symbols))
+        ],
+        "totals": {
+            "market_value": _number(total_market_value),
+            "cost_value": _number(total_cost_value),
+            "unrealized_pnl": _number(total_pnl),
+            "unrealized_pnl_pct": _number(total_pnl * 100 / total_cost_value) if total_cost_value else None,
+            "day_change": _number(total_day_change),
+            "day_change_pct": _number(total_day_change * 100 / previous_value) if previous_value else None,
+        },
+        "sector_weights": {
+            name: _number(value * 100 / total_market_value) if total_market_value else 0.0
+            for name, value in zip(compiled["sector_names"], sector_values)
+        },
+        "missing_quotes": [symbols[i] for i in range(len(symbols)) if not priced[i]],
+        "stale_quotes": stale_quotes,
+        "stale": bool(stale_quotes),
+    }
+
+def value_holdings(holdings: list, refresh: bool = False) -> dict:
+    """Resolve, quote and value an unsaved list of holdings"""
+    resolved, errors = resolve_holdings(holdings)
+    compiled = compile_holdings(resolved)
+    valuation = value_compiled(compiled, get_or_fetch_quotes(compiled["symbols"], refresh))
+    valuation["unresolved"] = errors
+    return valuation
+
+def save_portfolio(name: str, holdings: list) -> tuple:
+    """
+    Resolve and store a portfolio server-side
+
+    Returns:
+        (portfolio id, {input symbol: error message} for holdings that were dropped)
+    """
+    resolved, errors = resolve_holdings(holdings)
+    portfolio_id = uuid.uuid4().hex
+    now = datetime.now().isoformat()
+
+    db.portfolios_collection.insert_one({
+        "_id": portfolio_id,
+        "name": name,
+        "holdings": resolved,
+        "created_at": now,
+        "updated_at": now,
+    })
+
+    with _compiled_lock:
+        _compiled[portfolio_id] = (now, name, compile_holdings(resolved))
+
+    logger.info(f"💼 Saved portfolio {portfolio_id} with {len(resolved)} holdings")
+    return portfolio_id, errors
+
+def load_portfolio(portfolio_id: str):
+    """
+    Get a saved portfolio as (name, compiled holdings), or None if it doesn't exist
+
+    The compiled form is reused only while the stored updated_at matches, which
+    costs one _id lookup instead of re-resolving every holding.
+    """
+    meta = db.portfolios_collection.find_one({"_id": portfolio_id}, {"updated_at": 1})
+    if meta is None:
+        with _compiled_lock:
+            _compiled.pop(portfolio_id, None)
+        return None
+
+    with _compiled_lock:
+        cached = _compiled.get(portfolio_id)
+    if cached is not None and cached[0] == meta.get("updated_at"):
+        return cached[1], cached[2]
+
+    doc = db.portfolios_collection.find_one({"_id": portfolio_id})
+    if doc is None:
+        return None
+
+    name, compiled = doc.get("name"), compile_holdings(doc["holdings"])
+    with _compiled_lock:
+        _compiled[portfolio_id] = (doc.get("updated_at"), name, compiled)
+    return name, compiled
+
+def delete_portfolio(portfolio_id: str) -> bool:
+    """Delete a saved portfolio; returns False if it didn't exist"""
+    with _compiled_lock:
+        _compiled.pop(portfolio_id, None)
+    return db.portfolios_collection.delete_one({"_id": portfolio_id}).deleted_count > 0
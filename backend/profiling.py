@@ -0,0 +1,311 @@
+"""
+On-demand request profiling
+
+Disabled unless PROFILING_ENABLED=1, in which case main.py installs the
+middleware and route class below; otherwise nothing here runs per request.
+When enabled, a request is profiled if it carries `X-Debug-Profile`
+(matching PROFILING_TOKEN when one is set) or is picked by
+PROFILING_SAMPLE_RATE. Each profiled request stores a cProfile dump, a text
+report with the hottest functions and tracemalloc allocation stats, and a
+JSON summary under PROFILING_DIR.
+"""
+from contextvars import ContextVar
+from datetime import datetime
+import asyncio
+import functools
+import hmac
+import inspect
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+PROFILING_DIR = os.getenv("PROFILING_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+PROFILING_MAX_ARTIFACTS = int(os.getenv("PROFILING_MAX_ARTIFACTS", "50"))
+PROFILING_HEADER = b"x-debug-profile"
+PROFILES_PATH = "/api/debug/profiles"
+TOP_ENTRIES = 30
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+ARTIFACT_FORMATS = {"prof": "application/octet-stream", "txt": "text/plain", "json": "application/json"}
+
+_active_session = ContextVar("profiling_session", default=None)
+# cProfile can't run two profilers at once on newer Pythons, so only one request holds it
+_cprofile_lock = threading.Lock()
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+
+
+def _start_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+        _tracemalloc_users += 1
+        tracemalloc.reset_peak()
+        return tracemalloc.take_snapshot()
+
+
+def _stop_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0:
+            tracemalloc.stop()
+        return snapshot, peak
+
+
+class ProfileSession:
+    """State for one profiled request"""
+
+    def __init__(self, method: str, path: str, query: str, reason: str):
+        import cProfile
+
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.query = query
+        self.reason = reason
+        self.status_code = None
+        self.started_at = datetime.now().isoformat()
+        self.profiler = cProfile.Profile() if _cprofile_lock.acquire(blocking=False) else None
+        self.worker_profilers = []  # provider calls made on executor threads, see run_profiled
+        self._start = time.perf_counter()
+        self._snapshot = _start_tracemalloc()
+        self._finished = None
+
+    def finish(self):
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+        try:
+            self._finished = _stop_tracemalloc()
+        finally:
+            if self.profiler is not None:
+                _cprofile_lock.release()
+
+    def close(self) -> dict:
+        """Stop tracing and write the artifacts; blocking, so the middleware runs it in a thread"""
+        self.finish()
+        return self.save()
+
+    def save(self) -> dict:
+        """Write the artifacts and return the summary"""
+        import io
+        import pstats
+
+        os.makedirs(PROFILING_DIR, exist_ok=True)
+        base = os.path.join(PROFILING_DIR, self.id)
+        end_snapshot, peak = self._finished
+        allocations = end_snapshot.compare_to(self._snapshot, "lineno")[:TOP_ENTRIES]
+
+        report = io.StringIO()
+        report.write(f"{self.method} {self.path}{'?' + self.query if self.query else ''}\n")
+        report.write(f"status {self.status_code}, {self.duration_ms:.1f} ms, peak traced memory {peak / 1024:.1f} KiB\n\n")
+        if self.profiler is not None:
+            stats = pstats.Stats(self.profiler, stream=report)
+            for worker_profiler in list(self.worker_profilers):
+                stats.add(worker_profiler)
+            stats.dump_stats(base + ".prof")
+            stats.sort_stats("cumulative").print_stats(TOP_ENTRIES)
+        else:
+            report.write("cProfile skipped: another request was being profiled\n")
+        report.write("\nTop allocations (tracemalloc, growth during the request):\n")
+        for stat in allocations:
+            report.write(f"{stat}\n")
+
+        with open(base + ".txt", "w") as f:
+            f.write(report.getvalue())
+
+        summary = {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "query": self.query,
+            "reason": self.reason,
+            "status_code": self.status_code,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 1),
+            "peak_traced_kib": round(peak / 1024, 1),
+            "allocated_kib": round(sum(stat.size_diff for stat in allocations) / 1024, 1),
+            "artifacts": ["prof", "txt", "json"] if self.profiler is not None else ["txt", "json"],
+        }
+        with open(base + ".json", "w") as f:
+            json.dump(summary, f)
+
+        _prune_artifacts()
+        return summary
+
+
+def _prune_artifacts():
+    """Keep only the newest PROFILING_MAX_ARTIFACTS profiles"""
+    summaries = sorted(
+        (name for name in os.listdir(PROFILING_DIR) if name.endswith(".json")),
+        key=lambda name: os.path.getmtime(os.path.join(PROFILING_DIR, name)),
+    )
+    for name in summaries[:-PROFILING_MAX_ARTIFACTS]:
+        profile_id = name[:-len(".json")]
+        for extension in ARTIFACT_FORMATS:
+            path = os.path.join(PROFILING_DIR, f"{profile_id}.{extension}")
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def token_matches(value: str) -> bool:
+    """Whether an X-Debug-Profile value equals PROFILING_TOKEN (False when no token is set)"""
+    return PROFILING_TOKEN is not None and value is not None and hmac.compare_digest(value, PROFILING_TOKEN)
+
+
+def _profile_reason(scope) -> str:
+    """Why this request should be profiled, or None"""
+    if scope["path"].startswith(PROFILES_PATH):
+        # Reading profiles sends the token header too; don't profile those requests
+        return None
+    for name, value in scope.get("headers", []):
+        if name == PROFILING_HEADER:
+            if PROFILING_TOKEN is None or token_matches(value.decode()):
+                return "header"
+            break
+    if PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that opens a profiling session for selected requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        reason = _profile_reason(scope) if scope["type"] == "http" else None
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+
+        # tracemalloc snapshots walk every traced block, so they stay off the event loop
+        session = await asyncio.to_thread(
+            ProfileSession, scope["method"], scope["path"], scope.get("query_string", b"").decode(), reason
+        )
+        token = _active_session.set(session)
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                session.status_code = message["status"]
+                message.setdefault("headers", []).append((b"x-profile-id", session.id.encode()))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            _active_session.reset(token)
+            try:
+                summary = await asyncio.to_thread(session.close)
+                logger.info(f"🔬 Profiled {summary['method']} {summary['path']} in {summary['duration_ms']} ms ({session.id})")
+            except Exception as e:
+                logger.error(f"❌ Could not save profile {session.id}: {e}")
+
+
+def profiled(endpoint):
+    """
+    Wrap an endpoint so the active session's cProfile runs around it
+
+    Sync endpoints run in a worker thread, where the middleware's own thread
+    can't see them, so the profiler is switched on inside the call itself.
+    """
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            session = _active_session.get()
+            if session is None or session.profiler is None:
+                return await endpoint(*args, **kwargs)
+            session.profiler.enable()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                session.profiler.disable()
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        session = _active_session.get()
+        if session is None or session.profiler is None:
+            return endpoint(*args, **kwargs)
+        session.profiler.enable()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            session.profiler.disable()
+    return wrapper
+
+
+def run_profiled(fn, *args, **kwargs):
+    """
+    Run fn on a worker thread, profiled when it belongs to a profiled request
+
+    The request's profiler only sees its own thread, so provider calls sent to an
+    executor (see circuit_breaker) get their own profiler, merged into the
+    request's report on save. Submit through contextvars.copy_context().run so
+    the active session is visible here.
+    """
+    session = _active_session.get()
+    if session is None or session.profiler is None:
+        return fn(*args, **kwargs)
+
+    import cProfile
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+ profiles every thread through sys.monitoring, so the request's profiler already covers this call
+        return fn(*args, **kwargs)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        profiler.disable()
+        session.worker_profilers.append(profiler)
+
+
+def get_profiled_route_class():
+    """APIRoute subclass whose endpoints are wrapped with `profiled`"""
+    from fastapi.routing import APIRoute
+
+    class ProfiledRoute(APIRoute):
+        def __init__(self, path, endpoint, **kwargs):
+            super().__init__(path, profiled(endpoint), **kwargs)
+
+    return ProfiledRoute
+
+
+def list_profiles() -> list:
+    """Summaries of stored profiles, newest first"""
+    if not os.path.isdir(PROFILING_DIR):
+        return []
+    summaries = []
+    for name in os.listdir(PROFILING_DIR):
+        if name.endswith(".json"):
+            try:
+                with open(os.path.join(PROFILING_DIR, name)) as f:
+                    summaries.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return sorted(summaries, key=lambda summary: summary["started_at"], reverse=True)
+
+
+def get_artifact_path(profile_id: str, artifact_format: str):
+    """Path of a stored artifact, or None if the id/format is invalid or missing"""
+    if not PROFILE_ID_PATTERN.match(profile_id) or artifact_format not in ARTIFACT_FORMATS:
+        return None
+    path = os.path.join(PROFILING_DIR, f"{profile_id}.{artifact_format}")
+    return path if os.path.exists(path) else None
@@ -0,0 +1,178 @@
+from trading_calendar import is_market_open, price_max_age
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Entries younger than these are served without refetching while the market is open;
+# outside sessions prices can't change, so anything fetched after the last close is kept
+QUOTE_CACHE_TTL_SECONDS = float(os.getenv("QUOTE_CACHE_TTL_SECONDS", "60"))
+NEWS_CACHE_TTL_SECONDS = float(os.getenv("NEWS_CACHE_TTL_SECONDS", "900"))
+NEWS_CLOSED_CACHE_TTL_SECONDS = float(os.getenv("NEWS_CLOSED_CACHE_TTL_SECONDS", "3600"))
+HISTORY_CACHE_TTL_SECONDS = float(os.getenv("HISTORY_CACHE_TTL_SECONDS", "900"))
+
+_lock = threading.Lock()
+_quotes = {}
+_news = {}  # symbol -> (fetched_at, articles)
+_history = {}  # (symbol, period) -> (fetched_at, records)
+_listeners = []
+
+def quote_max_age() -> float:
+    return price_max_age(QUOTE_CACHE_TTL_SECONDS)
+
+def history_max_age() -> float:
+    return price_max_age(HISTORY_CACHE_TTL_SECONDS)
+
+def news_max_age() -> float:
+    return NEWS_CACHE_TTL_SECONDS if is_market_open() else max(NEWS_CACHE_TTL_SECONDS, NEWS_CLOSED_CACHE_TTL_SECONDS)
+
+def add_listener(callback):
+    """
+    Register a callback run on every stored quote as callback(quote, previous_quote)
+
+    previous_quote is None the first time a symbol is seen.
+    """
+    _listeners.append(callback)
+
+def put_quote(quote: dict):
+    """Store the latest quote for a symbol (quote must contain 'symbol' and 'close')"""
+    entry = dict(quote)
+    entry["fetched_at"] = time.time()
+    with _lock:
+        previous = _quotes.get(entry["symbol"])
+        _quotes[entry["symbol"]] = entry
+
+    for callback in _listeners:
+        try:
+            callback(entry, previous)
+        except Exception as e:
+            # A failing listener must not break the quote path
+            logger.error(f"❌ Quote listener {getattr(callback, '__name__', callback)} failed for {entry['symbol']}: {e}")
+
+def put_quotes(quotes: dict):
+    """Store several quotes at once, keyed by symbol"""
+    for quote in quotes.values():
+        put_quote(quote)
+
+def get_quote(symbol: str, max_age: float = None):
+    """
+    Get the cached quote for a symbol
+
+    Args:
+        symbol: Normalized stock symbol
+        max_age: Maximum age in seconds; None returns the quote regardless of age
+
+    Returns:
+        The quote dict, or None if missing or too old
+    """
+    with _lock:
+        quote = _quotes.get(symbol)
+    if quote is None:
+        return None
+    if max_age is not None and time.time() - quote["fetched_at"] > max_age:
+        return None
+    return quote
+
+def get_quotes(symbols: list, max_age: float = None) -> dict:
+    """Get cached quotes for several symbols; missing or stale ones are left out"""
+    now = time.time()
+    with _lock:
+        quotes = {symbol: _quotes.get(symbol) for symbol in symbols}
+    return {
+        symbol: quote for symbol, quote in quotes.items()
+        if quote is not None and (max_age is None or now - quote["fetched_at"] <= max_age)
+    }
+
+def put_news(symbol: str, articles: list):
+    """Store the latest news articles for a symbol"""
+    with _lock:
+        _news[symbol] = (time.time(), articles)
+
+def get_news(symbol: str, max_age: float = None):
+    """Cached news articles for a symbol, or None if missing or older than max_age"""
+    with _lock:
+        entry = _news.get(symbol)
+    if entry is None or (max_age is not None and time.time() - entry[0] > max_age):
+        return None
+    return entry[1]
+
+def put_history(symbol: str, period: str, records: list):
+    """Store history records for a symbol and frontend period (e.g. '1M')"""
+    with _lock:
+        _history[(symbol, period)] = (time.time(), records)
+
+def get_history(symbol: str, period: str, max_age: float = None):
+    """Cached history records, or None if missing or older than max_age"""
+    with _lock:
+        entry = _history.get((symbol, period))
+    if entry is None or (max_age is not None and time.time() - entry[0] > max_age):
+        return None
+    return entry[1]
+
+def _stale_quotes(symbols: list) -> dict:
+    """
+    Last known quotes for symbols the provider couldn't serve, marked stale
+
+    Cached quotes of any age come first, then the latest stored OHLC records. The
+    database read is bounded by MONGO_WARMUP_TIMEOUT_SECONDS, since this runs
+    while the provider is already failing and the request has waited once.
+    """
+    import db
+    import pymongo
+    from db_utils import get_latest_stored_quotes
+
+    quotes = {symbol: dict(quote, stale=True) for symbol, quote in get_quotes(symbols).items()}
+    remaining = [symbol for symbol in symbols if symbol not in quotes]
+    if remaining:
+        try:
+            with pymongo.timeout(db.WARMUP_TIMEOUT_SECONDS):
+                stored = get_latest_stored_quotes(remaining)
+            for symbol, record in stored.items():
+                quotes[symbol] = dict(record, stale=True)
+        except Exception as e:
+            logger.error(f"❌ Could not read stored quotes: {e}")
+    return quotes
+
+def get_or_fetch_quotes(symbols: list, refresh: bool = False, fallback: bool = True) -> dict:
+    """
+    Get quotes for all symbols, fetching only missing or stale ones in one multi-ticker call
+
+    Args:
+        symbols: Normalized symbols
+        refresh: Ignore cached quotes and fetch everything live
+        fallback: When the provider fails, serve the last cached or stored quotes
+            (marked "stale": True) instead of raising. They are not put back in the cache.
+    """
+    from fetcher import fetch_quotes
+
+    quotes = {} if refresh else get_quotes(symbols, max_age=quote_max_age())
+    missing = [symbol for symbol in symbols if symbol not in quotes]
+
+    if missing:
+        logger.info(f"🚀 Fetching {len(missing)} quotes in one batch")
+        try:
+            fetched = fetch_quotes(missing)
+        except Exception as e:
+            if not fallback:
+                raise
+            logger.warning(f"⚠️ Price provider unavailable for {len(missing)} quotes ({e}), serving last known prices")
+            quotes.update(_stale_quotes(missing))
+            return quotes
+        put_quotes(fetched)
+        quotes.update(fetched)
+
+    return quotes
+
+def percent_change(quote: dict):
+    """
+    Percent change against the previous close, or None if the quote doesn't carry it
+
+    There is deliberately no fallback to the session open: mixing the two bases
+    would make changes from different quote sources incomparable.
+    """
+    prev_close = quote.get("prev_close")
+    if not prev_close:
+        return None
+    return (quote["close"] - prev_close) * 100 / prev_close
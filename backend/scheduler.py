@@ -1,11 +1,17 @@
 import schedule, time
 from fetcher import fetch_ohlc, fetch_news
-from db import stocks_collection, news_collection
 from db_utils import update_stock_in_database
 from indian_stocks import get_stocks
+from maintenance import run_maintenance
+from quote_cache import put_quote, add_listener
+from alerts import alert_engine
+from trading_calendar import is_trading_day, now_ist, get_holidays
 
 STOCKS = get_stocks("all")  # Get all Indian stocks
 
+# Evaluate price alerts on every quote fetched by the batch
+add_listener(alert_engine.on_quote)
+
 def update_all_stocks():
     """Daily batch update: Delete old data and insert fresh data for all stocks"""
     from datetime import datetime
@@ -18,10 +24,23 @@ def update_all_stocks():
     
     today = datetime.now().strftime("%Y-%m-%d")
     
+    # Prices don't change on weekends and exchange holidays, so there is nothing new to fetch
+    session_day = now_ist().date()
+    if not is_trading_day(session_day):
+        reason = get_holidays().get(session_day, "weekend")
+        logger.info(f"⏭️ Skipping daily batch update for {session_day}: NSE closed ({reason})")
+        return
+    
     logger.info(f"🚀 Starting daily batch update for {today}")
     logger.info(f"📊 Total stocks to process: {len(STOCKS)}")
     logger.info("🧹 Old data will be cleaned automatically during updates...")
     
+    # Pick up alert rules registered through the API since the last run
+    try:
+        alert_engine.reload()
+    except Exception as e:
+        logger.error(f"❌ Could not reload alert rules: {e}")
+    
     # Batch update all stocks
     successful_updates = 0
     failed_updates = 0
@@ -33,6 +52,8 @@ def update_all_stocks():
             
             # Fetch OHLC and news data
             ohlc = fetch_ohlc(stock)
+            if ohlc:
+                put_quote(ohlc)  # Runs alert evaluation for this stock
             company_name = stock.replace('.NS', '')
             news = fetch_news(company_name)
             
@@ -57,7 +78,20 @@ def update_all_stocks():
     logger.info(f"   📈 OHLC: {successful_updates} successful, {failed_updates} failed")
     logger.info(f"   📰 Total news articles stored: {total_news_stored}")
 
-schedule.every().day.at("18:00").do(update_all_stocks)
+def run_daily_maintenance():
+    """Nightly compaction, dedup and retention pass"""
+    import logging
+    
+    try:
+        run_maintenance()
+    except Exception as e:
+        logging.getLogger(__name__).error(f"❌ Database maintenance failed: {e}")
+
+# In IST, so the trading-day check in update_all_stocks looks at the session that just closed
+# whatever the server's timezone, and maintenance stays in the overnight gap (schedule
+# resolves the zone with pytz)
+schedule.every().day.at("18:00", "Asia/Kolkata").do(update_all_stocks)
+schedule.every().day.at("02:00", "Asia/Kolkata").do(run_daily_maintenance)
 
 while True:
     schedule.run_pending()
@@ -117,57 +117,3 @@ def find_stock_matches(user_input: str, max_suggestions: int = 5) -> dict:
         "suggestions": symbol_suggestions[:max_suggestions],
         "company_matches": company_matches
     }
-
-def clean_duplicate_symbols_in_db():
-    """
-    Clean duplicate symbols in database (different cases of same stock)
-    """
-    from db import stocks_collection, news_collection
-    import logging
-    
-    logger = logging.getLogger(__name__)
-    
-    # Get all unique symbols from database
-    all_symbols = stocks_collection.distinct("symbol")
-    
-    # Group symbols by normalized version
-    symbol_groups = {}
-    for symbol in all_symbols:
-        normalized = normalize_symbol(symbol)
-        if normalized not in symbol_groups:
-            symbol_groups[normalized] = []
-        symbol_groups[normalized].append(symbol)
-    
-    # Find and clean duplicates
-    cleaned_count = 0
-    for normalized, symbols in symbol_groups.items():
-        if len(symbols) > 1:
-            logger.info(f"🔍 Found duplicates for {normalized}: {symbols}")
-            
-            # Keep the properly formatted one (uppercase with .NS)
-            primary_symbol = normalized
-            duplicates = [s for s in symbols if s != primary_symbol]
-            
-            # Move data from duplicates to primary symbol
-            for duplicate in duplicates:
-                # Update OHLC records
-                stocks_collection.update_many(
-                    {"symbol": duplicate},
-                    {"$set": {"symbol": primary_symbol}}
-                )
-                
-                # Update news records
-                news_collection.update_many(
-                    {"stock": duplicate},
-                    {"$set": {"stock": primary_symbol}}
-                )
-                
-                logger.info(f"🔄 Merged {duplicate} → {primary_symbol}")
-                cleaned_count += 1
-    
-    if cleaned_count > 0:
-        logger.info(f"✅ Cleaned {cleaned_count} duplicate symbols")
-    else:
-        logger.info("✅ No duplicate symbols found")
-    
-    return cleaned_count
@@ -0,0 +1,95 @@
+import db
+from indian_stocks import SYMBOL_MASTER
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Reloaded periodically so edits to the collection reach every process; after a failed
+# load (seed data or the previous copy in use) the retry comes sooner
+SYMBOL_MASTER_REFRESH_SECONDS = float(os.getenv("SYMBOL_MASTER_REFRESH_SECONDS", "3600"))
+SYMBOL_MASTER_RETRY_SECONDS = float(os.getenv("SYMBOL_MASTER_RETRY_SECONDS", "60"))
+
+_lock = threading.Lock()
+_master = None  # symbol -> {"symbol", "name", "sector"}
+_next_load = 0.0  # time.monotonic() after which get_symbol_master reloads
+
+def _seed_entries() -> dict:
+    return {
+        symbol: {"symbol": symbol, "name": name, "sector": sector}
+        for symbol, (name, sector) in SYMBOL_MASTER.items()
+    }
+
+def load_symbol_master() -> dict:
+    """
+    Load the symbol master from the `symbols` collection, seeding it on first use
+
+    When the database is unavailable, keeps the copy already loaded or falls back
+    to the built-in seed data, and schedules a retry after SYMBOL_MASTER_RETRY_SECONDS.
+    The first quote listener call lands here, so it is bounded by
+    MONGO_WARMUP_TIMEOUT_SECONDS rather than the client's server-selection timeout.
+    """
+    global _master, _next_load
+    import pymongo
+
+    try:
+        with pymongo.timeout(db.WARMUP_TIMEOUT_SECONDS):
+            entries = {
+                doc["_id"]: {"symbol": doc["_id"], "name": doc.get("name"), "sector": doc.get("sector", "other")}
+                for doc in db.symbols_collection.find({})
+            }
+            if not entries:
+                entries = _seed_entries()
+                db.symbols_collection.bulk_write([
+                    pymongo.UpdateOne(
+                        {"_id": symbol},
+                        {"$setOnInsert": {"name": entry["name"], "sector": entry["sector"]}},
+                        upsert=True,
+                    ) for symbol, entry in entries.items()
+                ])
+                logger.info(f"🗂️ Seeded symbol master with {len(entries)} symbols")
+    except Exception as e:
+        with _lock:
+            _next_load = time.monotonic() + SYMBOL_MASTER_RETRY_SECONDS
+            if _master is None:
+                _master = _seed_entries()
+            entries = _master
+        logger.error(
+            f"❌ Could not load symbol master, retrying in {SYMBOL_MASTER_RETRY_SECONDS:.0f}s "
+            f"with {len(entries)} symbols in use: {e}"
+        )
+        return entries
+
+    with _lock:
+        _master = entries
+        _next_load = time.monotonic() + SYMBOL_MASTER_REFRESH_SECONDS
+    return entries
+
+def _claim_reload() -> bool:
+    """Whether this caller should reload; pushes the next attempt out so others keep the current copy"""
+    global _next_load
+    with _lock:
+        if _master is not None and time.monotonic() < _next_load:
+            return False
+        _next_load = time.monotonic() + SYMBOL_MASTER_RETRY_SECONDS
+        return True
+
+def get_symbol_master() -> dict:
+    """Symbol master keyed by symbol, reloaded every SYMBOL_MASTER_REFRESH_SECONDS"""
+    if _claim_reload():
+        return load_symbol_master()
+    return _master
+
+def get_sector(symbol: str) -> str:
+    """Sector of a stock from the symbol master ('other' if unknown)"""
+    entry = get_symbol_master().get(symbol)
+    return entry["sector"] if entry else "other"
+
+def get_categories() -> dict:
+    """Symbols grouped by sector"""
+    categories = {}
+    for symbol, entry in get_symbol_master().items():
+        categories.setdefault(entry["sector"], []).append(symbol)
+    return categories
@@ -0,0 +1,177 @@
+import pytest
+
+import db
+import alerts
+from alerts import AlertEngine, _ThresholdIndex, quote_metrics
+
+
+class _Result:
+    def __init__(self, modified_count=0, deleted_count=0):
+        self.modified_count = modified_count
+        self.deleted_count = deleted_count
+
+
+class _Cursor(list):
+    def sort(self, key, direction):
+        return _Cursor(sorted(self, key=lambda doc: doc.get(key), reverse=direction < 0))
+
+    def limit(self, n):
+        return _Cursor(self[:n])
+
+
+def _matches(doc, query):
+    for key, condition in query.items():
+        if isinstance(condition, dict):
+            if not (key in doc and doc[key] > condition["$gt"]):
+                return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+
+class FakeAlertsCollection:
+    """The few alerts_collection operations AlertEngine uses"""
+
+    def __init__(self):
+        self.docs = {}
+
+    def find(self, query):
+        return _Cursor(dict(doc) for doc in self.docs.values() if _matches(doc, query))
+
+    def insert_one(self, doc):
+        self.docs[doc["_id"]] = dict(doc)
+
+    def update_one(self, query, update):
+        doc = self.docs.get(query["_id"])
+        if doc is None or doc.get("status") != query.get("status"):
+            return _Result()
+        doc.update(update["$set"])
+        return _Result(modified_count=1)
+
+    def delete_one(self, query):
+        return _Result(deleted_count=1 if self.docs.pop(query["_id"], None) else 0)
+
+
+class RecordingNotifier:
+    def __init__(self):
+        self.events = []
+
+    def notify(self, event):
+        self.events.append(event)
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(db, "alerts_collection", FakeAlertsCollection(), raising=False)
+    return AlertEngine(notifier=RecordingNotifier())
+
+
+def fired_thresholds(events):
+    return sorted(event["threshold"] for event in events)
+
+
+def test_threshold_index_keeps_thresholds_sorted():
+    index = _ThresholdIndex()
+    for threshold, rule_id in [(105, "a"), (100, "b"), (110, "c"), (100, "d")]:
+        index.add(threshold, rule_id)
+
+    assert index.thresholds == [100, 100, 105, 110]
+    index.remove(100, "d")
+    assert index.rule_ids == ["b", "a", "c"]
+    assert index.pop_range(1, 3) == ["a", "c"]
+    assert index.pop_range(1, 1) == []
+
+
+def test_above_fires_only_thresholds_crossed_upwards(engine):
+    for threshold in (101, 102, 103, 104):
+        engine.add_rule("TCS.NS", "price_above", threshold)
+
+    assert fired_thresholds(engine.evaluate("TCS.NS", {"price": 100.5})) == []
+    # (previous, value]: a threshold equal to the new value fires, one equal to the previous doesn't
+    assert fired_thresholds(engine.evaluate("TCS.NS", {"price": 102})) == [101, 102]
+    assert fired_thresholds(engine.evaluate("TCS.NS", {"price": 101})) == []
+    assert fired_thresholds(engine.evaluate("TCS.NS", {"price": 103})) == [103]
+
+
+def test_below_fires_only_thresholds_crossed_downwards(engine):
+    for threshold in (96, 97, 98, 99):
+        engine.add_rule("TCS.NS", "price_below", threshold)
+
+    assert fired_thresholds(engine.evaluate("TCS.NS", {"price": 99.5})) == []
+    # [value, previous): a threshold equal to the new value fires
+    assert fired_thresholds(engine.evaluate("TCS.NS", {"price": 98})) == [98, 99]
+    assert fired_thresholds(engine.evaluate("TCS.NS", {"price": 98.5})) == []
+    assert fired_thresholds(engine.evaluate("TCS.NS", {"price": 96.5})) == [97]
+
+
+def test_first_tick_fires_rules_already_satisfied(engine):
+    engine.add_rule("TCS.NS", "price_above", 101.5)
+    engine.add_rule("TCS.NS", "price_above", 105)
+
+    assert fired_thresholds(engine.evaluate("TCS.NS", {"price": 102})) == [101.5]
+
+
+def test_rule_added_when_already_satisfied_fires_immediately(engine):
+    engine.evaluate("TCS.NS", {"price": 102})
+
+    rule = engine.add_rule("TCS.NS", "price_above", 101.5)
+
+    assert rule["status"] == "triggered"
+    assert rule["triggered_value"] == 102
+    assert db.alerts_collection.docs[rule["_id"]]["status"] == "triggered"
+    assert [event["alert_id"] for event in engine.notifier.events] == [rule["_id"]]
+    # Not left in the index to fire again
+    assert engine.evaluate("TCS.NS", {"price": 103}) == []
+
+
+def test_rule_added_when_not_satisfied_waits_for_crossing(engine):
+    engine.evaluate("TCS.NS", {"price": 100})
+
+    rule = engine.add_rule("TCS.NS", "price_above", 101.5)
+
+    assert rule["status"] == "active"
+    assert fired_thresholds(engine.evaluate("TCS.NS", {"price": 103})) == [101.5]
+
+
+def test_rule_fires_only_once(engine):
+    engine.add_rule("TCS.NS", "price_below", 99)
+
+    assert len(engine.evaluate("TCS.NS", {"price": 98})) == 1
+    engine.evaluate("TCS.NS", {"price": 100})
+    assert engine.evaluate("TCS.NS", {"price": 97}) == []
+
+
+def test_triggered_alerts_are_read_from_the_database(engine):
+    first = engine.add_rule("TCS.NS", "price_above", 101)
+    engine.add_rule("TCS.NS", "price_above", 110)
+    engine.evaluate("TCS.NS", {"price": 102})
+
+    # Another process (e.g. the scheduler) sees the trigger without the notifier
+    other = AlertEngine()
+    triggered = other.list_triggered()
+    assert [rule["_id"] for rule in triggered] == [first["_id"]]
+    assert other.list_triggered(since=triggered[0]["triggered_at"]) == []
+
+
+def test_failed_rule_load_backs_off(engine, monkeypatch):
+    calls = []
+
+    def failing_find(query):
+        calls.append(query)
+        raise RuntimeError("database unreachable")
+
+    monkeypatch.setattr(db.alerts_collection, "find", failing_find)
+
+    assert engine.evaluate("TCS.NS", {"price": 100}) == []
+    assert engine.evaluate("TCS.NS", {"price": 101}) == []
+    assert len(calls) == 1
+
+    monkeypatch.setattr(alerts.time, "monotonic", lambda: engine._next_load_attempt)
+    engine.evaluate("TCS.NS", {"price": 102})
+    assert len(calls) == 2
+
+
+def test_pct_change_requires_previous_close():
+    assert "pct_change" not in quote_metrics({"close": 105, "open": 100, "volume": 10})
+    assert quote_metrics({"close": 105, "open": 100, "prev_close": 100})["pct_change"] == pytest.approx(5.0)
+
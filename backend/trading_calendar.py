@@ -0,0 +1,130 @@
+"""
+NSE trading calendar
+
+Regular equity session is 09:15-15:30 IST, Monday to Friday, except the
+exchange holidays listed in NSE_HOLIDAYS_FILE (update it when NSE publishes
+the next year's circular). Prices only change during a session, so callers
+use this to decide whether data fetched earlier is still current.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+IST = timezone(timedelta(hours=5, minutes=30))
+SESSION_OPEN = time(9, 15)
+SESSION_CLOSE = time(15, 30)
+# Closing prices are settled from the 15:30-15:40 VWAP, so quotes are only final after this
+CLOSE_SETTLE_MINUTES = int(os.getenv("CLOSE_SETTLE_MINUTES", "15"))
+NSE_HOLIDAYS_FILE = os.getenv(
+    "NSE_HOLIDAYS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "nse_holidays.json")
+)
+
+_holidays = None
+_holidays_lock = threading.Lock()
+
+
+def get_holidays() -> dict:
+    """Exchange holidays as {date: description}, loaded once from NSE_HOLIDAYS_FILE"""
+    global _holidays
+    if _holidays is None:
+        with _holidays_lock:
+            if _holidays is None:
+                try:
+                    with open(NSE_HOLIDAYS_FILE) as f:
+                        entries = json.load(f)["holidays"]
+                    _holidays = {date.fromisoformat(entry["date"]): entry["description"] for entry in entries}
+                    year = now_ist().year
+                    if not any(day.year == year for day in _holidays):
+                        # Every weekday would count as a trading day until the file is updated
+                        logger.warning(f"⚠️ No NSE holidays listed for {year} in {NSE_HOLIDAYS_FILE}")
+                except (OSError, ValueError, KeyError) as e:
+                    # Weekends are still skipped; holidays just look like trading days
+                    logger.error(f"❌ Could not load NSE holidays from {NSE_HOLIDAYS_FILE}: {e}")
+                    _holidays = {}
+    return _holidays
+
+
+def now_ist() -> datetime:
+    return datetime.now(IST)
+
+
+def is_trading_day(day: date) -> bool:
+    return day.weekday() < 5 and day not in get_holidays()
+
+
+def session_bounds(day: date) -> tuple:
+    """(open, close) of the session on `day` as IST datetimes"""
+    return (
+        datetime.combine(day, SESSION_OPEN, tzinfo=IST),
+        datetime.combine(day, SESSION_CLOSE, tzinfo=IST),
+    )
+
+
+def is_market_open(now: datetime = None) -> bool:
+    now = (now or now_ist()).astimezone(IST)
+    if not is_trading_day(now.date()):
+        return False
+    session_open, session_close = session_bounds(now.date())
+    return session_open <= now < session_close
+
+
+def next_session_open(now: datetime = None) -> datetime:
+    """Open of the next session that hasn't started yet"""
+    now = (now or now_ist()).astimezone(IST)
+    day = now.date()
+    while True:
+        if is_trading_day(day):
+            session_open, _ = session_bounds(day)
+            if session_open > now:
+                return session_open
+        day += timedelta(days=1)
+
+
+def last_settled_close(now: datetime = None):
+    """
+    Moment the most recent session's prices became final (close + settle window)
+
+    Returns None while a session is running or still settling, since prices
+    can change at any time then.
+    """
+    now = (now or now_ist()).astimezone(IST)
+    settle = timedelta(minutes=CLOSE_SETTLE_MINUTES)
+    day = now.date()
+    for _ in range(30):
+        if is_trading_day(day):
+            session_open, session_close = session_bounds(day)
+            if session_open <= now < session_close + settle:
+                return None
+            if session_close + settle <= now:
+                return session_close + settle
+        day -= timedelta(days=1)
+    return None
+
+
+def price_max_age(open_ttl: float, now: datetime = None) -> float:
+    """
+    Maximum age of a cached price before it must be refetched
+
+    During a session (and its settle window) this is `open_ttl`. Otherwise
+    anything fetched since the last settled close is current until the next
+    open, so the allowed age stretches back to that close.
+    """
+    now = (now or now_ist()).astimezone(IST)
+    settled_at = last_settled_close(now)
+    if settled_at is None:
+        return open_ttl
+    return (now - settled_at).total_seconds()
+
+
+def is_current(fetched_at: datetime, now: datetime = None) -> bool:
+    """Whether prices fetched at `fetched_at` (aware, or naive UTC) are still final"""
+    settled_at = last_settled_close(now)
+    if settled_at is None:
+        return False
+    if fetched_at.tzinfo is None:
+        fetched_at = fetched_at.replace(tzinfo=timezone.utc)
+    return fetched_at >= settled_at
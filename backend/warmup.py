@@ -0,0 +1,326 @@
+import db
+from fetcher import fetch_histories, fetch_news, history_records, PERIOD_MAPPING
+from indian_stocks import get_stocks
+from quote_cache import get_or_fetch_quotes, put_history, put_news, get_history, get_news, history_max_age, news_max_age
+from trading_calendar import IST, is_market_open, next_session_open
+from datetime import datetime, timedelta
+import heapq
+import logging
+import math
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Access frequency: a hit loses half its weight every half-life
+ACCESS_HALF_LIFE_HOURS = float(os.getenv("ACCESS_HALF_LIFE_HOURS", "24"))
+ACCESS_STATS_SAVE_SECONDS = float(os.getenv("ACCESS_STATS_SAVE_SECONDS", "300"))
+
+# Prefetch budget
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1") == "1"
+WARMUP_MAX_SYMBOLS = int(os.getenv("WARMUP_MAX_SYMBOLS", "20"))
+WARMUP_NEWS_SYMBOLS = int(os.getenv("WARMUP_NEWS_SYMBOLS", "5"))
+WARMUP_HISTORY_PERIODS = int(os.getenv("WARMUP_HISTORY_PERIODS", "2"))
+WARMUP_DEFAULT_PERIODS = ["1M", "3M"]
+WARMUP_TIME_BUDGET_SECONDS = float(os.getenv("WARMUP_TIME_BUDGET_SECONDS", "120"))
+# Scheduled runs start this long after each session opens: anything fetched before the
+# open would already be stale (and expire within the session TTLs) by the time users arrive
+WARMUP_OPEN_DELAY_SECONDS = float(os.getenv("WARMUP_OPEN_DELAY_SECONDS", "60"))
+
+
+class DecayingCounter:
+    """Exponentially decaying hit counts per key"""
+
+    def __init__(self, half_life_seconds: float):
+        self._decay_rate = math.log(2) / half_life_seconds
+        self._lock = threading.Lock()
+        self._scores = {}  # key -> (score, updated_at)
+
+    def _decayed(self, score: float, updated_at: float, now: float) -> float:
+        return score * math.exp(-self._decay_rate * (now - updated_at))
+
+    def hit(self, key: str, weight: float = 1.0):
+        now = time.time()
+        with self._lock:
+            score, updated_at = self._scores.get(key, (0.0, now))
+            self._scores[key] = (self._decayed(score, updated_at, now) + weight, now)
+
+    def top(self, n: int) -> list:
+        """The n hottest keys as (key, current score)"""
+        now = time.time()
+        with self._lock:
+            scores = [(key, self._decayed(score, updated_at, now)) for key, (score, updated_at) in self._scores.items()]
+        return heapq.nlargest(n, scores, key=lambda entry: entry[1])
+
+    def dump(self) -> list:
+        with self._lock:
+            return [[key, score, updated_at] for key, (score, updated_at) in self._scores.items()]
+
+    def load(self, entries: list):
+        """Add saved entries to the current counts (hits recorded before loading are kept)"""
+        now = time.time()
+        with self._lock:
+            for key, score, updated_at in entries:
+                current, current_at = self._scores.get(key, (0.0, now))
+                self._scores[key] = (
+                    self._decayed(score, updated_at, now) + self._decayed(current, current_at, now), now
+                )
+
+
+symbol_access = DecayingCounter(ACCESS_HALF_LIFE_HOURS * 3600)
+period_access = DecayingCounter(ACCESS_HALF_LIFE_HOURS * 3600)
+
+def record_access(symbol: str, kind: str, period: str = None):
+    """
+    Count an access to a symbol from the quote, history or search endpoints
+
+    Searches count half, since they often don't lead to a data request.
+    """
+    symbol_access.hit(symbol, 0.5 if kind == "search" else 1.0)
+    if kind == "history" and period:
+        period_access.hit(period)
+
+_access_stats_loaded = False
+
+def save_access_stats():
+    """
+    Persist the counters so the hottest symbols survive a restart
+
+    Bounded by MONGO_WARMUP_TIMEOUT_SECONDS. Skipped until the saved counts have
+    been loaded, so an unreachable database at startup can't overwrite them.
+    """
+    import pymongo
+
+    if not _access_stats_loaded:
+        return
+    with pymongo.timeout(db.WARMUP_TIMEOUT_SECONDS):
+        for name, counter in (("symbols", symbol_access), ("periods", period_access)):
+            db.access_stats_collection.replace_one(
+                {"_id": name},
+                {"_id": name, "entries": counter.dump(), "saved_at": datetime.now().isoformat()},
+                upsert=True,
+            )
+
+def load_access_stats():
+    """Merge the saved counts into the in-memory counters, once, bounded like save_access_stats"""
+    global _access_stats_loaded
+    import pymongo
+
+    if _access_stats_loaded:
+        return
+    with pymongo.timeout(db.WARMUP_TIMEOUT_SECONDS):
+        docs = {name: db.access_stats_collection.find_one({"_id": name}) for name in ("symbols", "periods")}
+    for name, counter in (("symbols", symbol_access), ("periods", period_access)):
+        if docs[name]:
+            counter.load(docs[name].get("entries", []))
+    _access_stats_loaded = True
+
+def hottest_symbols(limit: int) -> list:
+    """Most accessed symbols, topped up from the stock list when there is little history"""
+    symbols = [symbol for symbol, _ in symbol_access.top(limit)]
+    for symbol in get_stocks("all"):
+        if len(symbols) >= limit:
+            break
+        if symbol not in symbols:
+            symbols.append(symbol)
+    return symbols
+
+def hottest_periods(limit: int) -> list:
+    periods = [period for period, _ in period_access.top(limit) if period in PERIOD_MAPPING]
+    for period in WARMUP_DEFAULT_PERIODS:
+        if len(periods) >= limit:
+            break
+        if period not in periods:
+            periods.append(period)
+    return periods
+
+
+_state_lock = threading.Lock()
+_state = {
+    "status": "idle",
+    "reason": None,
+    "started_at": None,
+    "finished_at": None,
+    "symbols": [],
+    "periods": [],
+    "steps_total": 0,
+    "steps_done": 0,
+    "quotes_warmed": 0,
+    "histories_warmed": 0,
+    "news_warmed": 0,
+    "budget_exhausted": False,
+    "errors": [],
+}
+
+def _update_state(**changes):
+    with _state_lock:
+        _state.update(changes)
+
+def _add_progress(**increments):
+    with _state_lock:
+        for key, value in increments.items():
+            _state[key] += value
+        _state["steps_done"] += 1
+
+def _record_error(step: str, error: Exception):
+    logger.error(f"❌ Warm-up {step} failed: {error}")
+    with _state_lock:
+        _state["errors"].append(f"{step}: {error}")
+        _state["steps_done"] += 1
+
+def run_warmup(reason: str):
+    """
+    Prefetch quotes, the most requested history ranges and news for the hottest symbols
+
+    Quotes and history use one multi-ticker download each; news is fetched per
+    symbol for the top WARMUP_NEWS_SYMBOLS. Entries still current for the trading
+    calendar are skipped, so off-hours runs mostly cost nothing. Stops early once
+    the time budget is spent.
+    """
+    deadline = time.monotonic() + WARMUP_TIME_BUDGET_SECONDS
+    symbols = hottest_symbols(WARMUP_MAX_SYMBOLS)
+    periods = hottest_periods(WARMUP_HISTORY_PERIODS)
+    news_symbols = symbols[:WARMUP_NEWS_SYMBOLS]
+
+    _update_state(
+        reason=reason,
+        started_at=datetime.now().isoformat(),
+        finished_at=None,
+        symbols=symbols,
+        periods=periods,
+        steps_total=1 + len(periods) + len(news_symbols),
+        steps_done=0,
+        quotes_warmed=0,
+        histories_warmed=0,
+        news_warmed=0,
+        budget_exhausted=False,
+        errors=[],
+    )
+    logger.info(f"🔥 Warming caches ({reason}) for {len(symbols)} symbols, periods {periods}")
+
+    try:
+        quotes = get_or_fetch_quotes(symbols, refresh=is_market_open(), fallback=False)
+        _add_progress(quotes_warmed=len(quotes))
+    except Exception as e:
+        _record_error("quotes", e)
+
+    for period in periods:
+        if time.monotonic() > deadline:
+            _update_state(budget_exhausted=True)
+            break
+        try:
+            max_age = history_max_age()
+            missing = [symbol for symbol in symbols if get_history(symbol, period, max_age=max_age) is None]
+            histories = fetch_histories(missing, PERIOD_MAPPING[period])
+            for symbol, hist in histories.items():
+                put_history(symbol, period, history_records(hist))
+            _add_progress(histories_warmed=len(histories))
+        except Exception as e:
+            _record_error(f"history {period}", e)
+
+    for symbol in news_symbols:
+        if time.monotonic() > deadline:
+            _update_state(budget_exhausted=True)
+            break
+        try:
+            if get_news(symbol, max_age=news_max_age()) is None:
+                put_news(symbol, fetch_news(symbol.replace('.NS', '')))
+            _add_progress(news_warmed=1)
+        except Exception as e:
+            _record_error(f"news {symbol}", e)
+
+    _update_state(finished_at=datetime.now().isoformat())
+    logger.info(f"✅ Cache warm-up ({reason}) completed: {get_warmup_status()['progress_pct']}% of steps")
+
+def _claim() -> bool:
+    """Mark a warm-up as running; False if one already is"""
+    with _state_lock:
+        if _state["status"] == "running":
+            return False
+        _state["status"] = "running"
+        return True
+
+def _run_claimed(reason: str):
+    try:
+        run_warmup(reason)
+    except Exception as e:
+        logger.error(f"❌ Cache warm-up ({reason}) failed: {e}")
+    finally:
+        _update_state(status="idle")
+
+def trigger_warmup(reason: str = "manual") -> bool:
+    """Start a warm-up in the background; False if one is already running"""
+    if not _claim():
+        return False
+    threading.Thread(target=_run_claimed, args=(reason,), name="cache-warmup", daemon=True).start()
+    return True
+
+def get_warmup_status() -> dict:
+    with _state_lock:
+        status = dict(_state)
+    status["progress_pct"] = round(status["steps_done"] * 100 / status["steps_total"]) if status["steps_total"] else 0
+    status["hottest"] = [
+        {"symbol": symbol, "score": round(score, 2)} for symbol, score in symbol_access.top(10)
+    ]
+    return status
+
+
+def next_open_run(now: datetime) -> datetime:
+    """Next scheduled warm-up after `now`: WARMUP_OPEN_DELAY_SECONDS after a session opens"""
+    delay = timedelta(seconds=WARMUP_OPEN_DELAY_SECONDS)
+    return next_session_open(now - delay) + delay
+
+
+_stop_event = threading.Event()
+
+def _persist_access_stats():
+    """Load the saved counts if that hasn't succeeded yet, then save the current ones"""
+    try:
+        load_access_stats()
+        save_access_stats()
+    except Exception as e:
+        logger.error(f"❌ Could not persist access stats: {e}")
+
+def _warmup_loop(database_ready: bool):
+    if database_ready:
+        try:
+            load_access_stats()
+        except Exception as e:
+            logger.error(f"❌ Could not load access stats: {e}")
+
+    if WARMUP_ON_STARTUP and _claim():
+        _run_claimed("startup")
+
+    next_run = next_open_run(datetime.now(IST))
+    while True:
+        wait = min((next_run - datetime.now(IST)).total_seconds(), ACCESS_STATS_SAVE_SECONDS)
+        if _stop_event.wait(max(wait, 0)):
+            return
+
+        _persist_access_stats()
+
+        if datetime.now(IST) >= next_run:
+            if _claim():
+                _run_claimed("market-open")
+            next_run = next_open_run(datetime.now(IST))
+
+def start_warmup(database_ready: bool = True):
+    """
+    Start the startup/market-open warm-up thread
+
+    The saved access counts are loaded on that thread, and only when the startup
+    ping succeeded; otherwise the first periodic save retries the load.
+    """
+    _stop_event.clear()
+    threading.Thread(
+        target=_warmup_loop, args=(database_ready,), name="cache-warmup-scheduler", daemon=True
+    ).start()
+
+def stop_warmup():
+    """Stop the warm-up thread and persist the access counts (blocking, bounded by the Mongo timeout)"""
+    _stop_event.set()
+    try:
+        save_access_stats()
+    except Exception as e:
+        logger.error(f"❌ Could not save access stats: {e}")